@@ -177,6 +177,14 @@ REDIS_PORT = os.environ.get('REDIS_PORT', '6379')
 REDIS_DB = os.environ.get('REDIS_DB', '0')
 REDIS_URL = f'redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}'
 
+# Shared cache, so invalidation (e.g. the SiteSettings version) reaches every web and worker process
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = REDIS_URL
 CELERY_RESULT_BACKEND = REDIS_URL
@@ -333,9 +341,30 @@ KUBERNETES_ENABLED = str_to_bool(os.environ.get('KUBERNETES_ENABLED', 'True'))
 KUBERNETES_NAMESPACE = os.environ.get('KUBERNETES_NAMESPACE', 'fnbox-functions')
 KIND_CLUSTER_NAME = os.environ.get('KIND_CLUSTER_NAME', 'fnbox-cluster')
 
+# Pin function pods to a dedicated node pool, e.g. "fnbox.io/pool=functions" (comma-separated key=value pairs).
+# Leave empty to let the scheduler consider every node.
+KUBERNETES_FUNCTION_NODE_SELECTOR = dict(
+    (key.strip(), value.strip())
+    for key, _, value in (
+        pair.partition('=') for pair in os.environ.get('KUBERNETES_FUNCTION_NODE_SELECTOR', '').split(',')
+    )
+    if key.strip() and value.strip()
+)
+
+# Function autoscaler: "hpa" (reactive CPU/memory HorizontalPodAutoscaler) or "phpa"
+# (PredictiveHorizontalPodAutoscaler, requires the jthomperoo/predictive-horizontal-pod-autoscaler operator)
+KUBERNETES_AUTOSCALER = os.environ.get('KUBERNETES_AUTOSCALER', 'hpa').strip().lower()
+
 # Image reload schedule (in days) - set to 0 to disable
 KIND_IMAGE_RELOAD_INTERVAL_DAYS = int(os.environ.get('KIND_IMAGE_RELOAD_INTERVAL_DAYS', '1'))
 
+# Invocation retention (in days) - older FunctionInvocation rows are pruned daily; 0 keeps them forever
+INVOCATION_RETENTION_DAYS = int(os.environ.get('INVOCATION_RETENTION_DAYS', '0'))
+
+# Buffer finished invocation results in Redis and write them in batches every N seconds
+# (0 = write each result as soon as the invocation completes)
+INVOCATION_RESULT_FLUSH_SECONDS = int(os.environ.get('INVOCATION_RESULT_FLUSH_SECONDS', '0'))
+
 # Function Execution Backend
 # Options: 'kubernetes'
 FUNCTION_BACKEND = os.environ.get('FUNCTION_BACKEND', 'kubernetes')
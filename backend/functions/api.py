@@ -2,7 +2,7 @@ from ninja import Router, Schema
 from ninja.errors import HttpError
 from typing import List, Any, Dict, Optional
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count
+from django.db.models import Q, F, Count, Prefetch
 from django.utils.text import slugify
 import logging
 from .models import Function, FunctionInvocation, FunctionTrigger
@@ -16,6 +16,62 @@ from django.utils import timezone
 logger = logging.getLogger(__name__)
 router = Router(tags=["Functions"])
 
+# Function columns written by update_function (everything FunctionUpdateIn can set)
+FUNCTION_UPDATE_FIELDS = [
+    'name', 'description', 'code', 'handler', 'runtime', 'memory_mb',
+    'vcpu_count', 'timeout_seconds', 'status', 'is_public', 'updated_at',
+]
+
+
+def _function_detail_queryset():
+    """
+    Function queryset with everything FunctionDetailOut needs loaded up front:
+    team/creator joined, depset/secret IDs prefetched, and relation counts annotated.
+    """
+    return Function.objects.select_related('team', 'created_by').prefetch_related(
+        Prefetch('depsets', queryset=Depset.objects.only('id')),
+        Prefetch('secrets', queryset=Secret.objects.only('id')),
+    ).annotate(
+        depset_count=Count('depsets', distinct=True),
+        secret_count=Count('secrets', distinct=True),
+        trigger_count=Count('triggers', distinct=True),
+    )
+
+
+def _function_detail_out(func):
+    """Build FunctionDetailOut from a function loaded via _function_detail_queryset()."""
+    return FunctionDetailOut(
+        id=func.id,
+        uuid=func.uuid,
+        name=func.name,
+        slug=func.slug,
+        description=func.description,
+        team_id=func.team.id,
+        team_name=func.team.name,
+        code=func.code,
+        handler=func.handler,
+        runtime=func.runtime,
+        memory_mb=func.memory_mb,
+        vcpu_count=func.vcpu_count,
+        timeout_seconds=func.timeout_seconds,
+        status=func.status,
+        is_public=func.is_public,
+        invocation_count=func.invocation_count,
+        last_invoked_at=func.last_invoked_at,
+        last_deployed_at=func.last_deployed_at,
+        created_at=func.created_at,
+        updated_at=func.updated_at,
+        created_by_username=func.created_by.email if func.created_by else None,
+        depset_count=func.depset_count,
+        secret_count=func.secret_count,
+        depset_ids=[depset.id for depset in func.depsets.all()],
+        secret_ids=[secret.id for secret in func.secrets.all()],
+        trigger_count=func.trigger_count,
+        deployment_name=func.deployment_name,
+        service_name=func.service_name,
+        k8s_namespace=func.k8s_namespace,
+    )
+
 
 class ClusterLimitsOut(Schema):
     """Schema for cluster resource limits"""
@@ -265,7 +321,7 @@ def get_function(request, function_id: str):
     Get detailed information about a specific function by UUID.
     User must be a member of the function's team or the function must be public.
     """
-    func = get_object_or_404(Function, uuid=function_id)
+    func = get_object_or_404(_function_detail_queryset(), uuid=function_id)
 
     # Check access permissions
     if not func.is_public:
@@ -281,46 +337,7 @@ def get_function(request, function_id: str):
         if not membership:
             raise HttpError(403, "You don't have access to this function")
 
-    # Count depsets, secrets, and triggers
-    depset_count = func.depsets.count()
-    secret_count = func.secrets.count()
-    trigger_count = func.triggers.count()
-
-    # Get IDs of attached depsets and secrets
-    depset_ids = list(func.depsets.values_list('id', flat=True))
-    secret_ids = list(func.secrets.values_list('id', flat=True))
-
-    return FunctionDetailOut(
-        id=func.id,
-        uuid=func.uuid,
-        name=func.name,
-        slug=func.slug,
-        description=func.description,
-        team_id=func.team.id,
-        team_name=func.team.name,
-        code=func.code,
-        handler=func.handler,
-        runtime=func.runtime,
-        memory_mb=func.memory_mb,
-        vcpu_count=func.vcpu_count,
-        timeout_seconds=func.timeout_seconds,
-        status=func.status,
-        is_public=func.is_public,
-        invocation_count=func.invocation_count,
-        last_invoked_at=func.last_invoked_at,
-        last_deployed_at=func.last_deployed_at,
-        created_at=func.created_at,
-        updated_at=func.updated_at,
-        created_by_username=func.created_by.email if func.created_by else None,
-        depset_count=depset_count,
-        secret_count=secret_count,
-        depset_ids=depset_ids,
-        secret_ids=secret_ids,
-        trigger_count=trigger_count,
-        deployment_name=func.deployment_name,
-        service_name=func.service_name,
-        k8s_namespace=func.k8s_namespace,
-    )
+    return _function_detail_out(func)
 
 
 @router.post("/", response=FunctionDetailOut, auth=session_mfa_auth)
@@ -386,46 +403,9 @@ def create_function(request, payload: FunctionCreateIn):
         )
         func.secrets.set(secrets)
 
-    # Count depsets, secrets, and triggers
-    depset_count = func.depsets.count()
-    secret_count = func.secrets.count()
-    trigger_count = func.triggers.count()
-
-    # Get IDs of attached depsets and secrets
-    depset_ids = list(func.depsets.values_list('id', flat=True))
-    secret_ids = list(func.secrets.values_list('id', flat=True))
-
-    return FunctionDetailOut(
-        id=func.id,
-        uuid=func.uuid,
-        name=func.name,
-        slug=func.slug,
-        description=func.description,
-        team_id=func.team.id,
-        team_name=func.team.name,
-        code=func.code,
-        handler=func.handler,
-        runtime=func.runtime,
-        memory_mb=func.memory_mb,
-        vcpu_count=func.vcpu_count,
-        timeout_seconds=func.timeout_seconds,
-        status=func.status,
-        is_public=func.is_public,
-        invocation_count=func.invocation_count,
-        last_invoked_at=func.last_invoked_at,
-        last_deployed_at=func.last_deployed_at,
-        created_at=func.created_at,
-        updated_at=func.updated_at,
-        created_by_username=func.created_by.email if func.created_by else None,
-        depset_count=depset_count,
-        secret_count=secret_count,
-        depset_ids=depset_ids,
-        secret_ids=secret_ids,
-        trigger_count=trigger_count,
-        deployment_name=func.deployment_name,
-        service_name=func.service_name,
-        k8s_namespace=func.k8s_namespace,
-    )
+    # Reload with related counts and IDs in a single round-trip
+    func = _function_detail_queryset().get(pk=func.pk)
+    return _function_detail_out(func)
 
 
 @router.get("/{function_id}/deployment-status", response=DeploymentStatusOut, auth=session_mfa_auth)
@@ -495,7 +475,8 @@ def update_function(request, function_id: str, payload: FunctionUpdateIn):
     if payload.is_public is not None:
         func.is_public = payload.is_public
 
-    func.save()
+    # Named fields only, so a concurrent secrets_version bump isn't overwritten
+    func.save(update_fields=FUNCTION_UPDATE_FIELDS)
 
     # Update depsets if provided
     if payload.depset_ids is not None:
@@ -513,46 +494,9 @@ def update_function(request, function_id: str, payload: FunctionUpdateIn):
         )
         func.secrets.set(secrets)
 
-    # Count depsets, secrets, and triggers
-    depset_count = func.depsets.count()
-    secret_count = func.secrets.count()
-    trigger_count = func.triggers.count()
-
-    # Get IDs of attached depsets and secrets
-    depset_ids = list(func.depsets.values_list('id', flat=True))
-    secret_ids = list(func.secrets.values_list('id', flat=True))
-
-    return FunctionDetailOut(
-        id=func.id,
-        uuid=func.uuid,
-        name=func.name,
-        slug=func.slug,
-        description=func.description,
-        team_id=func.team.id,
-        team_name=func.team.name,
-        code=func.code,
-        handler=func.handler,
-        runtime=func.runtime,
-        memory_mb=func.memory_mb,
-        vcpu_count=func.vcpu_count,
-        timeout_seconds=func.timeout_seconds,
-        status=func.status,
-        is_public=func.is_public,
-        invocation_count=func.invocation_count,
-        last_invoked_at=func.last_invoked_at,
-        last_deployed_at=func.last_deployed_at,
-        created_at=func.created_at,
-        updated_at=func.updated_at,
-        created_by_username=func.created_by.email if func.created_by else None,
-        depset_count=depset_count,
-        secret_count=secret_count,
-        depset_ids=depset_ids,
-        secret_ids=secret_ids,
-        trigger_count=trigger_count,
-        deployment_name=func.deployment_name,
-        service_name=func.service_name,
-        k8s_namespace=func.k8s_namespace,
-    )
+    # Reload with related counts and IDs in a single round-trip
+    func = _function_detail_queryset().get(pk=func.pk)
+    return _function_detail_out(func)
 
 
 class TestInvocationIn(Schema):
@@ -704,7 +648,7 @@ def invoke_function_sync(request, function_id: str, payload: TestInvocationIn):
     """
     import time
     import uuid as uuid_module
-    from functions.kubernetes import KubernetesManager
+    from functions.kubernetes import k8s
     from functions.models import FunctionInvocation
 
     func = get_object_or_404(Function, uuid=function_id)
@@ -724,22 +668,14 @@ def invoke_function_sync(request, function_id: str, payload: TestInvocationIn):
     invocation = FunctionInvocation.objects.create(
         function=func,
         request_id=request_id,
-        status='pending',
+        status='running',
         input_data=payload.event,
         started_at=timezone.now()
     )
 
     try:
-        invocation.status = 'running'
-        invocation.save(update_fields=['status'])
-
         # Fetch secrets for environment variables
-        secrets_dict = {}
-        for secret in func.secrets.all():
-            try:
-                secrets_dict[secret.key] = secret.get_value()
-            except Exception as e:
-                logger.warning(f"Failed to decrypt secret {secret.id} for function {func.uuid}: {e}")
+        secrets_dict = Secret.bulk_get_values(func.secrets.all())
 
         # Add secrets to event context
         event_with_secrets = {
@@ -748,7 +684,7 @@ def invoke_function_sync(request, function_id: str, payload: TestInvocationIn):
         }
 
         # Invoke function directly via Kubernetes service (synchronous)
-        k8s_manager = KubernetesManager()
+        k8s_manager = k8s()
         result = k8s_manager.invoke_function(
             service_name=func.service_name,
             event=event_with_secrets,
@@ -769,10 +705,11 @@ def invoke_function_sync(request, function_id: str, payload: TestInvocationIn):
         invocation.completed_at = timezone.now()
         invocation.save()
 
-        # Update function statistics
-        func.invocation_count += 1
-        func.last_invoked_at = timezone.now()
-        func.save(update_fields=['invocation_count', 'last_invoked_at'])
+        # Update function statistics (atomic increment; skips Function post_save receivers)
+        Function.objects.filter(pk=func.pk).update(
+            invocation_count=F('invocation_count') + 1,
+            last_invoked_at=timezone.now()
+        )
 
         # Return the actual function output
         if result.get('success', True):
@@ -891,10 +828,16 @@ def get_team_invocations(request, team_id: int, limit: int = 100):
     if not TeamMember.objects.filter(team=team, user=user).exists():
         raise HttpError(403, "You don't have access to this team")
 
-    # Get recent invocations for all functions in the team
+    # Get recent invocations for all functions in the team.
+    # Only the function columns we serialize are joined - pulling Function.code
+    # for every row made this list scale with the size of each function's source.
     invocations = FunctionInvocation.objects.filter(
         function__team=team
-    ).select_related('function').order_by('-created_at')[:limit]
+    ).select_related('function').only(
+        'id', 'request_id', 'status', 'input_data', 'output_data', 'error_message',
+        'duration_ms', 'memory_used_mb', 'logs', 'created_at', 'started_at', 'completed_at',
+        'function__id', 'function__uuid', 'function__name',
+    ).order_by('-created_at')[:limit]
 
     return [
         InvocationListOut(
@@ -4,17 +4,96 @@ Kubernetes-based function execution manager
 Replaces FirecrackerManager with Kubernetes pods for function execution.
 """
 
+import copy
 import logging
+import threading
 import time
 import subprocess
 from typing import Dict, List, Optional
 import requests
+import urllib3
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Field manager recorded on objects we own via Server-Side Apply
+FIELD_MANAGER = "fnbox-controller"
+
+# Managers that owned our objects before Server-Side Apply: the Python client's
+# create/replace calls (manager name derived from its user agent) and kubectl.
+# Their fields are adopted into FIELD_MANAGER so applies can prune them.
+_LEGACY_FIELD_MANAGERS = frozenset({
+    "OpenAPI-Generator",
+    "kubectl",
+    "kubectl-create",
+    "kubectl-replace",
+    "kubectl-edit",
+    "kubectl-patch",
+    "kubectl-client-side-apply",
+})
+
+
+def _merge_fields_v1(target: Dict, source: Dict) -> Dict:
+    """Union a managedFields fieldsV1 set (nested dicts keyed by path element) into target"""
+    for key, value in source.items():
+        if isinstance(target.get(key), dict) and isinstance(value, dict):
+            _merge_fields_v1(target[key], value)
+        elif key not in target:
+            target[key] = copy.deepcopy(value)
+    return target
+
+# Process-wide API client shared by every KubernetesManager so all calls reuse
+# one warm connection pool instead of re-reading kubeconfig and re-doing TLS.
+_api_client = None
+_in_cluster = False
+_api_client_lock = threading.Lock()
+
+
+def _load_config() -> bool:
+    """Load Kubernetes configuration and return if running in-cluster"""
+    try:
+        # Try in-cluster config first (when running inside K8s)
+        config.load_incluster_config()
+        logger.info("Loaded in-cluster Kubernetes config")
+        return True
+    except:
+        # Fall back to local kubeconfig (for development)
+        try:
+            config.load_kube_config()
+            logger.info("Loaded local Kubernetes config")
+            return False
+        except Exception as e:
+            logger.error(f"Failed to load Kubernetes config: {e}")
+            raise
+
+
+def _get_api_client():
+    """Return (in_cluster, ApiClient), creating the shared client on first use"""
+    global _api_client, _in_cluster
+
+    if _api_client is None:
+        with _api_client_lock:
+            if _api_client is None:
+                _in_cluster = _load_config()
+                configuration = client.Configuration.get_default_copy()
+                configuration.connection_pool_maxsize = 64
+                # Retry transient API server/proxy errors on idempotent requests only
+                # (POST creates are never replayed; apply/merge PATCHes are idempotent).
+                # raise_on_status=False hands the last 5xx back to the client so it
+                # still surfaces as ApiException rather than urllib3's MaxRetryError.
+                configuration.retries = urllib3.Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'PATCH', 'DELETE'}),
+                    raise_on_status=False
+                )
+                _api_client = client.ApiClient(configuration=configuration)
+
+    return _in_cluster, _api_client
+
 
 # Runtime to Docker image mapping
 RUNTIME_IMAGES = {
@@ -50,32 +129,212 @@ RUNTIME_IMAGES = {
 }
 
 
+# Manifest templates for per-function resources. These are plain dicts in
+# Kubernetes API (camelCase) form: each deploy deep-copies the template and
+# fills in the function-specific fields instead of rebuilding a graph of
+# client.V1* model objects.
+_FUNCTION_CONTAINER_TEMPLATE = {
+    "name": "function",
+    "image": None,
+    "imagePullPolicy": "Never",  # Use only locally loaded images (via kind load)
+    "ports": [{"containerPort": 8080}],
+    "resources": {
+        "requests": {
+            "ephemeral-storage": "1Gi"  # Disk space for logs + /tmp
+        },
+        "limits": {
+            "ephemeral-storage": "2Gi"  # Max 2GB disk usage
+        }
+    },
+    "env": [],
+    "volumeMounts": [
+        {
+            "name": "function-code",
+            "mountPath": "/app/function.py",
+            "subPath": "function.py"
+        }
+    ],
+    "livenessProbe": {
+        "httpGet": {"path": "/health", "port": 8080},
+        "initialDelaySeconds": 10,
+        "periodSeconds": 30,  # Reduced from 10s to ease CPU load
+        "timeoutSeconds": 5,
+        "failureThreshold": 3
+    },
+    "readinessProbe": {
+        "httpGet": {"path": "/health", "port": 8080},
+        "initialDelaySeconds": 5,
+        "periodSeconds": 15,  # Reduced from 5s to ease CPU load
+        "timeoutSeconds": 3,
+        "failureThreshold": 2
+    },
+    "securityContext": {
+        "runAsNonRoot": True,
+        "runAsUser": 1000,  # Non-root user
+        "runAsGroup": 1000,
+        "allowPrivilegeEscalation": False,
+        "readOnlyRootFilesystem": False,  # Need writable /tmp
+        "capabilities": {
+            "drop": ["ALL"],  # Drop all capabilities
+            "add": ["NET_BIND_SERVICE"]  # Only allow binding to privileged ports if needed
+        }
+    }
+}
+
+_INSTALL_CONTAINER_TEMPLATE = {
+    "name": "install-dependencies",
+    "image": None,
+    "imagePullPolicy": "Never",  # Use only locally loaded images
+    "command": None,
+    "volumeMounts": [
+        {"name": "pip-packages", "mountPath": "/packages"}
+    ],
+    "resources": {
+        "requests": {"memory": "256Mi", "cpu": "200m"},
+        "limits": {"memory": "512Mi", "cpu": "500m"}
+    },
+    "securityContext": {
+        "runAsNonRoot": True,
+        "runAsUser": 1000,  # Non-root user
+        "runAsGroup": 1000,
+        "allowPrivilegeEscalation": False,
+        "readOnlyRootFilesystem": False,  # Need writable /packages
+        "capabilities": {
+            "drop": ["ALL"]  # Drop all capabilities
+        }
+    }
+}
+
+_DEPLOYMENT_TEMPLATE = {
+    "apiVersion": "apps/v1",
+    "kind": "Deployment",
+    "metadata": {
+        "name": None,
+        "labels": {"function-id": None}
+    },
+    "spec": {
+        "replicas": 1,
+        "selector": {"matchLabels": {"app": None}},
+        "template": {
+            "metadata": {
+                "labels": {"app": None, "function-id": None, "component": "function"}
+            },
+            "spec": {
+                "containers": [],
+                "volumes": [],
+                "restartPolicy": "Always",
+                "priorityClassName": "fnbox-function-priority",  # Use lower priority
+                # Spread replicas across nodes when possible, without ever blocking scheduling
+                "topologySpreadConstraints": [
+                    {
+                        "maxSkew": 1,
+                        "topologyKey": "kubernetes.io/hostname",
+                        "whenUnsatisfiable": "ScheduleAnyway",
+                        "labelSelector": {"matchLabels": {"app": None}}
+                    }
+                ],
+                "securityContext": {
+                    "runAsNonRoot": True,
+                    "runAsUser": 1000,
+                    "runAsGroup": 1000,
+                    "fsGroup": 1000,
+                    "seccompProfile": {
+                        "type": "RuntimeDefault"  # Use default seccomp profile
+                    }
+                },
+                # Prevent fork bombs - limit processes per pod
+                # Note: This requires PID limits to be enabled in kubelet
+                "terminationGracePeriodSeconds": 30  # Max 30s to gracefully terminate
+                # Note: activeDeadlineSeconds is not supported in Deployments, only bare Pods/Jobs
+            }
+        }
+    }
+}
+
+_SERVICE_TEMPLATE = {
+    "apiVersion": "v1",
+    "kind": "Service",
+    "metadata": {"name": None},
+    "spec": {
+        "selector": {"app": None},
+        "ports": [
+            {"protocol": "TCP", "port": 8080, "targetPort": 8080}
+        ],
+        "type": "ClusterIP"
+    }
+}
+
+_HPA_TEMPLATE = {
+    "apiVersion": "autoscaling/v2",
+    "kind": "HorizontalPodAutoscaler",
+    "metadata": {"name": None},
+    "spec": {
+        "scaleTargetRef": {
+            "apiVersion": "apps/v1",
+            "kind": "Deployment",
+            "name": None
+        },
+        "minReplicas": 1,
+        "maxReplicas": 5,  # Conservative limit to protect cluster resources
+        "metrics": [
+            # CPU-based scaling
+            {
+                "type": "Resource",
+                "resource": {
+                    "name": "cpu",
+                    "target": {"type": "Utilization", "averageUtilization": 70}
+                }
+            },
+            # Memory-based scaling
+            {
+                "type": "Resource",
+                "resource": {
+                    "name": "memory",
+                    "target": {"type": "Utilization", "averageUtilization": 80}
+                }
+            }
+        ],
+        "behavior": {
+            "scaleUp": {
+                "stabilizationWindowSeconds": 0,  # Scale up immediately
+                "policies": [
+                    {"type": "Percent", "value": 100, "periodSeconds": 15}  # Double pods at once if needed
+                ]
+            },
+            "scaleDown": {
+                "stabilizationWindowSeconds": 300,  # Wait 5 min before scaling down
+                "policies": [
+                    {"type": "Pods", "value": 1, "periodSeconds": 60}  # Remove one pod at a time
+                ]
+            }
+        }
+    }
+}
+
+# Predictive HPA (jthomperoo/predictive-horizontal-pod-autoscaler): same targets and
+# behavior as the HPA, but replicas are forecast from a linear fit over the last
+# 12 samples, projected 10s ahead, so capacity is added before CPU saturates.
+_PHPA_TEMPLATE = copy.deepcopy(_HPA_TEMPLATE)
+_PHPA_TEMPLATE["apiVersion"] = "jamiethompson.me/v1alpha1"
+_PHPA_TEMPLATE["kind"] = "PredictiveHorizontalPodAutoscaler"
+_PHPA_TEMPLATE["spec"]["syncPeriod"] = 10000  # Milliseconds between samples
+_PHPA_TEMPLATE["spec"]["models"] = [
+    {"type": "Linear", "name": "linear", "linear": {"lookAhead": 10000, "historySize": 12}}
+]
+
+
 class KubernetesManager:
     """Manages function execution on Kubernetes"""
 
     def __init__(self):
         self.namespace = getattr(settings, 'KUBERNETES_NAMESPACE', 'fnbox-functions')
-        self.in_cluster = self._load_config()
-        self.apps_v1 = client.AppsV1Api()
-        self.core_v1 = client.CoreV1Api()
-        self.autoscaling_v2 = client.AutoscalingV2Api()
-
-    def _load_config(self):
-        """Load Kubernetes configuration and return if running in-cluster"""
-        try:
-            # Try in-cluster config first (when running inside K8s)
-            config.load_incluster_config()
-            logger.info("Loaded in-cluster Kubernetes config")
-            return True
-        except:
-            # Fall back to local kubeconfig (for development)
-            try:
-                config.load_kube_config()
-                logger.info("Loaded local Kubernetes config")
-                return False
-            except Exception as e:
-                logger.error(f"Failed to load Kubernetes config: {e}")
-                raise
+        self.node_selector = getattr(settings, 'KUBERNETES_FUNCTION_NODE_SELECTOR', {})
+        self.autoscaler = getattr(settings, 'KUBERNETES_AUTOSCALER', 'hpa')
+        self.in_cluster, api_client = _get_api_client()
+        self.apps_v1 = client.AppsV1Api(api_client)
+        self.core_v1 = client.CoreV1Api(api_client)
+        self.autoscaling_v2 = client.AutoscalingV2Api(api_client)
+        self.custom_objects = client.CustomObjectsApi(api_client)
 
     @classmethod
     def initialize(cls):
@@ -389,16 +648,9 @@ class KubernetesManager:
         service_name = f"{deployment_name}-svc"
         hpa_name = f"{deployment_name}-hpa"
 
-        # Delete HPA first
-        try:
-            self.autoscaling_v2.delete_namespaced_horizontal_pod_autoscaler(
-                name=hpa_name,
-                namespace=self.namespace
-            )
-            logger.info(f"Deleted HPA {hpa_name}")
-        except ApiException as e:
-            if e.status != 404:
-                logger.warning(f"Failed to delete HPA: {e}")
+        # Delete the autoscaler first (both kinds, in case KUBERNETES_AUTOSCALER changed)
+        self._delete_hpa(hpa_name)
+        self._delete_phpa(hpa_name)
 
         # Delete Service
         try:
@@ -455,6 +707,33 @@ class KubernetesManager:
             if e.status != 404:
                 logger.warning(f"Failed to delete configmap: {e}")
 
+    def _delete_hpa(self, name: str):
+        """Delete a HorizontalPodAutoscaler, ignoring one that doesn't exist"""
+        try:
+            self.autoscaling_v2.delete_namespaced_horizontal_pod_autoscaler(
+                name=name,
+                namespace=self.namespace
+            )
+            logger.info(f"Deleted HPA {name}")
+        except ApiException as e:
+            if e.status != 404:
+                logger.warning(f"Failed to delete HPA: {e}")
+
+    def _delete_phpa(self, name: str):
+        """Delete a PredictiveHorizontalPodAutoscaler, ignoring one (or a CRD) that doesn't exist"""
+        try:
+            self.custom_objects.delete_namespaced_custom_object(
+                group='jamiethompson.me',
+                version='v1alpha1',
+                namespace=self.namespace,
+                plural='predictivehorizontalpodautoscalers',
+                name=name
+            )
+            logger.info(f"Deleted PHPA {name}")
+        except ApiException as e:
+            if e.status != 404:
+                logger.warning(f"Failed to delete PHPA: {e}")
+
     def get_function_status(self, deployment_name: str) -> Dict:
         """Get status of a function deployment"""
         try:
@@ -496,29 +775,118 @@ class KubernetesManager:
                 }
             raise
 
-    def _create_function_configmap(self, name: str, code: str):
-        """Store function code in ConfigMap"""
-        configmap = client.V1ConfigMap(
-            metadata=client.V1ObjectMeta(name=name),
-            data={"function.py": code}
+    def _apply(self, resource_path: str, body: Dict, response_type: str):
+        """
+        Server-Side Apply a manifest (PATCH with application/apply-patch+yaml).
+
+        The API server creates or updates the object in one idempotent call, so
+        there is no create -> 409 -> replace round-trip. The generated *_api
+        patch methods only send JSON/merge patch content types, hence the direct
+        call_api request.
+
+        Objects created before Server-Side Apply have their fields owned by the
+        old create/replace manager, and SSA never removes fields another manager
+        owns. The first apply on such an object adopts those fields and applies
+        again, so anything the manifest no longer contains (dropped env vars,
+        initContainers, volumes) is pruned.
+        """
+        result = self._server_side_apply(resource_path, body, response_type)
+        if self._adopt_legacy_managed_fields(resource_path, body["metadata"]["name"], result):
+            result = self._server_side_apply(resource_path, body, response_type)
+        return result
+
+    def _server_side_apply(self, resource_path: str, body: Dict, response_type: str):
+        """Send one Server-Side Apply request for body"""
+        return self.core_v1.api_client.call_api(
+            resource_path, 'PATCH',
+            path_params={'namespace': self.namespace, 'name': body["metadata"]["name"]},
+            query_params=[('fieldManager', FIELD_MANAGER), ('force', 'true')],
+            header_params={
+                'Accept': 'application/json',
+                'Content-Type': 'application/apply-patch+yaml',
+            },
+            body=body,
+            response_type=response_type,
+            auth_settings=['BearerToken'],
+            _return_http_data_only=True,
         )
 
+    def _adopt_legacy_managed_fields(self, resource_path: str, name: str, applied) -> bool:
+        """
+        Move fields owned by legacy (pre-SSA) managers into our Apply entry.
+
+        Returns True if managedFields were rewritten, i.e. the manifest must be
+        applied again to prune fields it no longer sets. Subresource entries
+        (status, scale) belong to controllers and are left alone.
+        """
+        api_client = self.core_v1.api_client
+        metadata = api_client.sanitize_for_serialization(applied).get("metadata") or {}
+        entries = metadata.get("managedFields") or []
+
+        def is_main(entry):
+            return not entry.get("subresource")
+
+        legacy = [
+            entry for entry in entries
+            if is_main(entry) and entry.get("operation") == "Update"
+            and entry.get("manager") in _LEGACY_FIELD_MANAGERS
+        ]
+        ours = next((
+            entry for entry in entries
+            if is_main(entry) and entry.get("operation") == "Apply" and entry.get("manager") == FIELD_MANAGER
+        ), None)
+        if not legacy or ours is None:
+            return False
+
+        fields = copy.deepcopy(ours.get("fieldsV1") or {})
+        for entry in legacy:
+            _merge_fields_v1(fields, entry.get("fieldsV1") or {})
+
+        managed_fields = [
+            dict(entry, fieldsV1=fields) if entry is ours else entry
+            for entry in entries
+            if not any(entry is old for old in legacy)
+        ]
+
         try:
-            self.core_v1.create_namespaced_config_map(
-                namespace=self.namespace,
-                body=configmap
+            api_client.call_api(
+                resource_path, 'PATCH',
+                path_params={'namespace': self.namespace, 'name': name},
+                header_params={
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json-patch+json',
+                },
+                body=[
+                    # Only rewrite the entries we just read
+                    {"op": "test", "path": "/metadata/resourceVersion", "value": metadata.get("resourceVersion")},
+                    {"op": "replace", "path": "/metadata/managedFields", "value": managed_fields},
+                ],
+                response_type='object',
+                auth_settings=['BearerToken'],
+                _return_http_data_only=True,
             )
-            logger.info(f"Created configmap {name}")
         except ApiException as e:
-            if e.status == 409:  # Already exists
-                self.core_v1.patch_namespaced_config_map(
-                    name=name,
-                    namespace=self.namespace,
-                    body=configmap
-                )
-                logger.info(f"Updated configmap {name}")
-            else:
-                raise
+            # Retried on the next deploy; the apply itself already succeeded
+            logger.warning(f"Failed to adopt legacy managed fields for {name}: {e}")
+            return False
+
+        logger.info(
+            f"Adopted fields of {', '.join(sorted({entry['manager'] for entry in legacy}))} "
+            f"into {FIELD_MANAGER} for {name}"
+        )
+        return True
+
+    def _create_function_configmap(self, name: str, code: str):
+        """Store function code in ConfigMap"""
+        configmap = {
+            "apiVersion": "v1",
+            "kind": "ConfigMap",
+            "metadata": {"name": name},
+            "data": {"function.py": code}
+        }
+
+        self._apply('/api/v1/namespaces/{namespace}/configmaps/{name}', configmap, 'V1ConfigMap')
+        logger.info(f"Applied configmap {name}")
 
     def _create_deployment(self, name: str, function_id: str, image: str,
                           memory_mb: int, cpu_millicores: int, replicas: int,
@@ -528,86 +896,28 @@ class KubernetesManager:
         dependencies = dependencies or []
 
         # Container spec
-        container = client.V1Container(
-            name="function",
-            image=image,
-            image_pull_policy="Never",  # Use only locally loaded images (via kind load)
-            ports=[client.V1ContainerPort(container_port=8080)],
-            resources=client.V1ResourceRequirements(
-                requests={
-                    "memory": f"{memory_mb}Mi",
-                    "cpu": f"{cpu_millicores}m",
-                    "ephemeral-storage": "1Gi"  # Disk space for logs + /tmp
-                },
-                limits={
-                    "memory": f"{int(memory_mb * 1.5)}Mi",  # 1.5x for burst capacity
-                    "cpu": f"{int(cpu_millicores * 1.5)}m",   # 1.5x for burst capacity
-                    "ephemeral-storage": "2Gi"  # Max 2GB disk usage
-                }
-            ),
-            env=[
-                client.V1EnvVar(name="FUNCTION_ID", value=function_id)
-            ],
-            volume_mounts=[
-                client.V1VolumeMount(
-                    name="function-code",
-                    mount_path="/app/function.py",
-                    sub_path="function.py"
-                )
-            ],
-            liveness_probe=client.V1Probe(
-                http_get=client.V1HTTPGetAction(
-                    path="/health",
-                    port=8080
-                ),
-                initial_delay_seconds=10,
-                period_seconds=30,  # Reduced from 10s to ease CPU load
-                timeout_seconds=5,
-                failure_threshold=3
-            ),
-            readiness_probe=client.V1Probe(
-                http_get=client.V1HTTPGetAction(
-                    path="/health",
-                    port=8080
-                ),
-                initial_delay_seconds=5,
-                period_seconds=15,  # Reduced from 5s to ease CPU load
-                timeout_seconds=3,
-                failure_threshold=2
-            ),
-            security_context=client.V1SecurityContext(
-                run_as_non_root=True,
-                run_as_user=1000,  # Non-root user
-                run_as_group=1000,
-                allow_privilege_escalation=False,
-                read_only_root_filesystem=False,  # Need writable /tmp
-                capabilities=client.V1Capabilities(
-                    drop=["ALL"],  # Drop all capabilities
-                    add=["NET_BIND_SERVICE"]  # Only allow binding to privileged ports if needed
-                )
-            )
-        )
+        container = copy.deepcopy(_FUNCTION_CONTAINER_TEMPLATE)
+        container["image"] = image
+        container["resources"]["requests"].update({
+            "memory": f"{memory_mb}Mi",
+            "cpu": f"{cpu_millicores}m",
+        })
+        container["resources"]["limits"].update({
+            "memory": f"{int(memory_mb * 1.5)}Mi",  # 1.5x for burst capacity
+            "cpu": f"{int(cpu_millicores * 1.5)}m",   # 1.5x for burst capacity
+        })
+        container["env"].append({"name": "FUNCTION_ID", "value": function_id})
 
         # Init container for installing dependencies (if any)
         init_containers = []
         volumes = [
-            client.V1Volume(
-                name="function-code",
-                config_map=client.V1ConfigMapVolumeSource(
-                    name=name
-                )
-            )
+            {"name": "function-code", "configMap": {"name": name}}
         ]
 
         if dependencies:
             # Add shared volume for installed packages (size-limited)
             volumes.append(
-                client.V1Volume(
-                    name="pip-packages",
-                    empty_dir=client.V1EmptyDirVolumeSource(
-                        size_limit="1Gi"  # Max 1GB for dependencies
-                    )
-                )
+                {"name": "pip-packages", "emptyDir": {"sizeLimit": "1Gi"}}  # Max 1GB for dependencies
             )
 
             # Determine package manager and install path based on runtime
@@ -621,9 +931,7 @@ class KubernetesManager:
                 package_path = '/packages'
 
                 # Add PYTHONPATH env var to main container
-                container.env.append(
-                    client.V1EnvVar(name="PYTHONPATH", value="/packages:$PYTHONPATH")
-                )
+                container["env"].append({"name": "PYTHONPATH", "value": "/packages:$PYTHONPATH"})
 
             elif 'nodejs' in runtime_lower:
                 pkg_manager = 'npm'
@@ -631,9 +939,7 @@ class KubernetesManager:
                 install_cmd = ['sh', '-c', f'cd /packages && npm install {" ".join(dependencies)}']
                 package_path = '/packages'
 
-                container.env.append(
-                    client.V1EnvVar(name="NODE_PATH", value="/packages/node_modules")
-                )
+                container["env"].append({"name": "NODE_PATH", "value": "/packages/node_modules"})
 
             elif 'ruby' in runtime_lower:
                 pkg_manager = 'gem'
@@ -645,9 +951,7 @@ class KubernetesManager:
                 install_cmd = ['sh', '-c', ' && '.join(gem_commands)]
                 package_path = '/packages'
 
-                container.env.append(
-                    client.V1EnvVar(name="GEM_PATH", value="/packages:$GEM_PATH")
-                )
+                container["env"].append({"name": "GEM_PATH", "value": "/packages:$GEM_PATH"})
 
             elif 'java' in runtime_lower:
                 pkg_manager = 'mvn'
@@ -656,9 +960,7 @@ class KubernetesManager:
                 install_cmd = ['sh', '-c', f'mvn dependency:copy-dependencies -DoutputDirectory=/packages {" ".join([f"-Dartifact={dep}" for dep in dependencies])}']
                 package_path = '/packages'
 
-                container.env.append(
-                    client.V1EnvVar(name="CLASSPATH", value="/packages/*:$CLASSPATH")
-                )
+                container["env"].append({"name": "CLASSPATH", "value": "/packages/*:$CLASSPATH"})
 
             elif 'dotnet' in runtime_lower:
                 pkg_manager = 'dotnet'
@@ -685,10 +987,10 @@ class KubernetesManager:
                 package_path = '/packages'
 
                 # Set Go environment variables for compilation
-                container.env.extend([
-                    client.V1EnvVar(name="GOPATH", value="/packages"),
-                    client.V1EnvVar(name="GOMODCACHE", value="/packages/pkg/mod"),
-                    client.V1EnvVar(name="GOCACHE", value="/tmp/go-build")
+                container["env"].extend([
+                    {"name": "GOPATH", "value": "/packages"},
+                    {"name": "GOMODCACHE", "value": "/packages/pkg/mod"},
+                    {"name": "GOCACHE", "value": "/tmp/go-build"},
                 ])
 
             elif 'rust' in runtime_lower:
@@ -705,147 +1007,47 @@ class KubernetesManager:
                 package_path = None
 
             if pkg_manager and install_cmd:
-                init_containers.append(
-                    client.V1Container(
-                        name="install-dependencies",
-                        image=image,
-                        image_pull_policy="Never",  # Use only locally loaded images
-                        command=install_cmd,
-                        volume_mounts=[
-                            client.V1VolumeMount(
-                                name="pip-packages",
-                                mount_path="/packages"
-                            )
-                        ],
-                        resources=client.V1ResourceRequirements(
-                            requests={
-                                "memory": "256Mi",
-                                "cpu": "200m"
-                            },
-                            limits={
-                                "memory": "512Mi",
-                                "cpu": "500m"
-                            }
-                        ),
-                        security_context=client.V1SecurityContext(
-                            run_as_non_root=True,
-                            run_as_user=1000,  # Non-root user
-                            run_as_group=1000,
-                            allow_privilege_escalation=False,
-                            read_only_root_filesystem=False,  # Need writable /packages
-                            capabilities=client.V1Capabilities(
-                                drop=["ALL"]  # Drop all capabilities
-                            )
-                        )
-                    )
-                )
+                init_container = copy.deepcopy(_INSTALL_CONTAINER_TEMPLATE)
+                init_container["image"] = image
+                init_container["command"] = install_cmd
+                init_containers.append(init_container)
 
                 # Add package volume mount to main container
                 if package_path:
-                    container.volume_mounts.append(
-                        client.V1VolumeMount(
-                            name="pip-packages",
-                            mount_path=package_path
-                        )
+                    container["volumeMounts"].append(
+                        {"name": "pip-packages", "mountPath": package_path}
                     )
 
-        # Pod template
-        template = client.V1PodTemplateSpec(
-            metadata=client.V1ObjectMeta(
-                labels={"app": name, "function-id": function_id, "component": "function"}
-            ),
-            spec=client.V1PodSpec(
-                init_containers=init_containers if init_containers else None,
-                containers=[container],
-                volumes=volumes,
-                restart_policy="Always",
-                priority_class_name="fnbox-function-priority",  # Use lower priority
-                security_context=client.V1PodSecurityContext(
-                    run_as_non_root=True,
-                    run_as_user=1000,
-                    run_as_group=1000,
-                    fs_group=1000,
-                    seccomp_profile=client.V1SeccompProfile(
-                        type="RuntimeDefault"  # Use default seccomp profile
-                    )
-                ),
-                # Prevent fork bombs - limit processes per pod
-                # Note: This requires PID limits to be enabled in kubelet
-                termination_grace_period_seconds=30  # Max 30s to gracefully terminate
-                # Note: activeDeadlineSeconds is not supported in Deployments, only bare Pods/Jobs
-            )
-        )
-
-        # Deployment spec
-        spec = client.V1DeploymentSpec(
-            replicas=replicas,
-            selector=client.V1LabelSelector(
-                match_labels={"app": name}
-            ),
-            template=template
-        )
-
-        deployment = client.V1Deployment(
-            api_version="apps/v1",
-            kind="Deployment",
-            metadata=client.V1ObjectMeta(
-                name=name,
-                labels={"function-id": function_id}
-            ),
-            spec=spec
-        )
-
-        try:
-            return self.apps_v1.create_namespaced_deployment(
-                namespace=self.namespace,
-                body=deployment
-            )
-        except ApiException as e:
-            if e.status == 409:  # Already exists
-                self.apps_v1.replace_namespaced_deployment(
-                    name=name,
-                    namespace=self.namespace,
-                    body=deployment
-                )
-                logger.info(f"Updated deployment {name}")
-            else:
-                raise
+        deployment = copy.deepcopy(_DEPLOYMENT_TEMPLATE)
+        deployment["metadata"]["name"] = name
+        deployment["metadata"]["labels"]["function-id"] = function_id
+        deployment["spec"]["replicas"] = replicas
+        deployment["spec"]["selector"]["matchLabels"]["app"] = name
+
+        template = deployment["spec"]["template"]
+        template["metadata"]["labels"].update({"app": name, "function-id": function_id})
+        template["spec"]["containers"] = [container]
+        template["spec"]["volumes"] = volumes
+        template["spec"]["topologySpreadConstraints"][0]["labelSelector"]["matchLabels"]["app"] = name
+        if self.node_selector:
+            template["spec"]["nodeSelector"] = dict(self.node_selector)
+        if init_containers:
+            template["spec"]["initContainers"] = init_containers
+
+        result = self._apply('/apis/apps/v1/namespaces/{namespace}/deployments/{name}', deployment, 'V1Deployment')
+        logger.info(f"Applied deployment {name}")
+        return result
 
     def _create_service(self, name: str, deployment_name: str):
         """Create Kubernetes Service for load balancing"""
 
-        service = client.V1Service(
-            api_version="v1",
-            kind="Service",
-            metadata=client.V1ObjectMeta(name=name),
-            spec=client.V1ServiceSpec(
-                selector={"app": deployment_name},
-                ports=[
-                    client.V1ServicePort(
-                        protocol="TCP",
-                        port=8080,
-                        target_port=8080
-                    )
-                ],
-                type="ClusterIP"
-            )
-        )
+        service = copy.deepcopy(_SERVICE_TEMPLATE)
+        service["metadata"]["name"] = name
+        service["spec"]["selector"]["app"] = deployment_name
 
-        try:
-            return self.core_v1.create_namespaced_service(
-                namespace=self.namespace,
-                body=service
-            )
-        except ApiException as e:
-            if e.status == 409:  # Already exists
-                self.core_v1.replace_namespaced_service(
-                    name=name,
-                    namespace=self.namespace,
-                    body=service
-                )
-                logger.info(f"Updated service {name}")
-            else:
-                raise
+        result = self._apply('/api/v1/namespaces/{namespace}/services/{name}', service, 'V1Service')
+        logger.info(f"Applied service {name}")
+        return result
 
     def _create_hpa(self, deployment_name: str):
         """
@@ -856,85 +1058,39 @@ class KubernetesManager:
         - Max replicas: 5 (conservative limit to protect cluster)
         - Target CPU: 70%
         - Target memory: 80%
+
+        With KUBERNETES_AUTOSCALER=phpa a PredictiveHorizontalPodAutoscaler with the
+        same targets is applied instead (requires the PHPA operator in the cluster).
         """
-        hpa = client.V2HorizontalPodAutoscaler(
-            api_version="autoscaling/v2",
-            kind="HorizontalPodAutoscaler",
-            metadata=client.V1ObjectMeta(
-                name=f"{deployment_name}-hpa"
-            ),
-            spec=client.V2HorizontalPodAutoscalerSpec(
-                scale_target_ref=client.V2CrossVersionObjectReference(
-                    api_version="apps/v1",
-                    kind="Deployment",
-                    name=deployment_name
-                ),
-                min_replicas=1,
-                max_replicas=5,  # Conservative limit to protect cluster resources
-                metrics=[
-                    # CPU-based scaling
-                    client.V2MetricSpec(
-                        type="Resource",
-                        resource=client.V2ResourceMetricSource(
-                            name="cpu",
-                            target=client.V2MetricTarget(
-                                type="Utilization",
-                                average_utilization=70
-                            )
-                        )
-                    ),
-                    # Memory-based scaling
-                    client.V2MetricSpec(
-                        type="Resource",
-                        resource=client.V2ResourceMetricSource(
-                            name="memory",
-                            target=client.V2MetricTarget(
-                                type="Utilization",
-                                average_utilization=80
-                            )
-                        )
-                    )
-                ],
-                behavior=client.V2HorizontalPodAutoscalerBehavior(
-                    scale_up=client.V2HPAScalingRules(
-                        stabilization_window_seconds=0,  # Scale up immediately
-                        policies=[
-                            client.V2HPAScalingPolicy(
-                                type="Percent",
-                                value=100,  # Double pods at once if needed
-                                period_seconds=15
-                            )
-                        ]
-                    ),
-                    scale_down=client.V2HPAScalingRules(
-                        stabilization_window_seconds=300,  # Wait 5 min before scaling down
-                        policies=[
-                            client.V2HPAScalingPolicy(
-                                type="Pods",
-                                value=1,  # Remove one pod at a time
-                                period_seconds=60
-                            )
-                        ]
-                    )
-                )
-            )
-        )
+        if self.autoscaler == 'phpa':
+            template, kind = _PHPA_TEMPLATE, 'PHPA'
+            resource_path = '/apis/jamiethompson.me/v1alpha1/namespaces/{namespace}/predictivehorizontalpodautoscalers/{name}'
+            response_type = 'object'
+        else:
+            template, kind = _HPA_TEMPLATE, 'HPA'
+            resource_path = '/apis/autoscaling/v2/namespaces/{namespace}/horizontalpodautoscalers/{name}'
+            response_type = 'V2HorizontalPodAutoscaler'
+
+        hpa = copy.deepcopy(template)
+        hpa["metadata"]["name"] = f"{deployment_name}-hpa"
+        hpa["spec"]["scaleTargetRef"]["name"] = deployment_name
+
+        # Remove the other kind left over from a previous KUBERNETES_AUTOSCALER setting,
+        # otherwise both would fight over the Deployment's replica count
+        if self.autoscaler == 'phpa':
+            self._delete_hpa(hpa["metadata"]["name"])
+        else:
+            self._delete_phpa(hpa["metadata"]["name"])
 
         try:
-            self.autoscaling_v2.create_namespaced_horizontal_pod_autoscaler(
-                namespace=self.namespace,
-                body=hpa
-            )
-            logger.info(f"Created HPA for {deployment_name} (min:1, max:5, CPU:70%, memory:80%)")
+            self._apply(resource_path, hpa, response_type)
+            logger.info(f"Applied {kind} for {deployment_name} (min:1, max:5, CPU:70%, memory:80%)")
         except ApiException as e:
-            if e.status == 409:  # Already exists
-                logger.info(f"HPA for {deployment_name} already exists")
-            else:
-                logger.warning(f"Failed to create HPA: {e}")
-                # Don't fail deployment if HPA creation fails
+            logger.warning(f"Failed to apply {kind}: {e}")
+            # Don't fail deployment if HPA creation fails
 
     def _wait_for_deployment(self, name: str, timeout: int = 60) -> bool:
-        """Wait for deployment to be ready"""
+        """Wait for the deployment's latest rollout to be fully ready"""
         start = time.time()
 
         while time.time() - start < timeout:
@@ -944,8 +1100,14 @@ class KubernetesManager:
                     namespace=self.namespace
                 )
 
-                if (deployment.status.ready_replicas and
-                    deployment.status.ready_replicas > 0):
+                # Same condition as `kubectl rollout status`: the controller has
+                # seen the latest spec and every replica runs the new ReplicaSet
+                status = deployment.status
+                desired = deployment.spec.replicas if deployment.spec.replicas is not None else 1
+                if ((status.observed_generation or 0) >= deployment.metadata.generation and
+                    (status.updated_replicas or 0) == desired and
+                    (status.ready_replicas or 0) == desired and
+                    status.unavailable_replicas in (None, 0)):
                     logger.info(f"Deployment {name} is ready")
                     return True
 
@@ -1002,3 +1164,14 @@ class KubernetesManager:
         except ApiException as e:
             logger.error(f"Failed to scale deployment: {e}")
             raise
+
+
+_manager = None
+
+
+def k8s() -> KubernetesManager:
+    """Return the process-wide KubernetesManager, created on first use"""
+    global _manager
+    if _manager is None:
+        _manager = KubernetesManager()
+    return _manager
@@ -25,35 +25,73 @@ class Command(BaseCommand):
 
         # Kind image reload task
         interval_days = getattr(settings, 'KIND_IMAGE_RELOAD_INTERVAL_DAYS', 1)
-        task_name = 'reload-kind-images'
-        celery_task = 'functions.tasks.reload_kind_images_task'
+        self.sync_interval_task(
+            'reload-kind-images',
+            'functions.tasks.reload_kind_images_task',
+            every_seconds=int(interval_days) * 24 * 60 * 60,
+            enabled=interval_days > 0,
+            setting=f'interval_days={interval_days}',
+            description=f'every {interval_days} day(s)',
+        )
 
-        if interval_days <= 0:
+        # Invocation retention task
+        retention_days = getattr(settings, 'INVOCATION_RETENTION_DAYS', 0)
+        self.sync_interval_task(
+            'prune-invocations',
+            'functions.tasks.prune_invocations_task',
+            every_seconds=24 * 60 * 60,
+            enabled=retention_days > 0,
+            setting=f'retention_days={retention_days}',
+            description=f'daily, keeping {retention_days} day(s)',
+        )
+
+        # Buffered invocation results flush task
+        flush_seconds = getattr(settings, 'INVOCATION_RESULT_FLUSH_SECONDS', 0)
+        self.sync_interval_task(
+            'flush-invocations',
+            'functions.tasks.flush_invocations_task',
+            every_seconds=flush_seconds,
+            enabled=flush_seconds > 0,
+            setting=f'flush_seconds={flush_seconds}',
+            description=f'every {flush_seconds}s',
+        )
+
+        self.stdout.write(self.style.SUCCESS('Done syncing PeriodicTasks.'))
+
+    def sync_interval_task(self, task_name, celery_task, *, every_seconds, enabled, setting, description):
+        """
+        Create or update an interval PeriodicTask, or delete it when disabled.
+
+        Args:
+            task_name: Unique PeriodicTask name
+            celery_task: Dotted path of the Celery task to run
+            every_seconds: Interval between runs
+            enabled: Whether the task should be registered at all
+            setting: Setting that controls the task, shown when it is disabled
+            description: Human-readable schedule, shown when it is registered
+        """
+        if not enabled:
             deleted, _ = PeriodicTask.objects.filter(name=task_name).delete()
             self.stdout.write(self.style.WARNING(
-                f'{task_name}: disabled (interval_days={interval_days}). Deleted={deleted}'
-            ))
-        else:
-            seconds = int(interval_days) * 24 * 60 * 60
-
-            schedule, _ = IntervalSchedule.objects.get_or_create(
-                every=seconds,
-                period=IntervalSchedule.SECONDS,
-            )
-            schedule_desc = f'every {interval_days} day(s)'
-
-            periodic, created = PeriodicTask.objects.update_or_create(
-                name=task_name,
-                defaults={
-                    'task': celery_task,
-                    'interval': schedule,
-                    'enabled': True,
-                    'kwargs': json.dumps({}),
-                },
-            )
-            action = 'Created' if created else 'Updated'
-            self.stdout.write(self.style.SUCCESS(
-                f'{action} {task_name}: {schedule_desc} -> {celery_task}'
+                f'{task_name}: disabled ({setting}). Deleted={deleted}'
             ))
+            return
+
+        schedule, _ = IntervalSchedule.objects.get_or_create(
+            every=every_seconds,
+            period=IntervalSchedule.SECONDS,
+        )
 
-        self.stdout.write(self.style.SUCCESS('Done syncing PeriodicTasks.'))
\ No newline at end of file
+        periodic, created = PeriodicTask.objects.update_or_create(
+            name=task_name,
+            defaults={
+                'task': celery_task,
+                'interval': schedule,
+                'enabled': True,
+                'kwargs': json.dumps({}),
+            },
+        )
+        action = 'Created' if created else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {task_name}: {description} -> {celery_task}'
+        ))
@@ -123,6 +123,11 @@ class Function(models.Model):
         blank=True,
         help_text="Secrets to inject as environment variables"
     )
+    secrets_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Bumped whenever attached secrets change; invalidates cached decrypted secrets"
+    )
 
     # Status and metadata
     status = models.CharField(
@@ -280,6 +285,7 @@ class FunctionInvocation(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['function', '-created_at']),
+            models.Index(fields=['created_at']),  # Retention pruning range scans
             models.Index(fields=['request_id']),
             models.Index(fields=['status']),
         ]
@@ -3,14 +3,22 @@ Django signals for managing Celery Beat scheduled tasks via django-celery-beat.
 """
 import json
 import logging
-from django.db.models.signals import post_save, post_delete
+from functools import lru_cache
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django_celery_beat.models import CrontabSchedule, PeriodicTask
 from functions.models import FunctionTrigger, Function
+from vault.models import Secret
 
 logger = logging.getLogger(__name__)
 
 
+# CrontabSchedule field names, in cron expression order
+CRON_FIELDS = ('minute', 'hour', 'day_of_month', 'month_of_year', 'day_of_week')
+
+
+@lru_cache(maxsize=1024)
 def parse_cron_expression(cron_str):
     """
     Parse a cron expression string into django-celery-beat CrontabSchedule fields.
@@ -20,20 +28,15 @@ def parse_cron_expression(cron_str):
     Example: "0 0 * * 0" = every Sunday at midnight
 
     Returns:
-        dict with keys: minute, hour, day_of_month, month_of_year, day_of_week
+        tuple of (minute, hour, day_of_month, month_of_year, day_of_week);
+        use dict(zip(CRON_FIELDS, ...)) for keyword arguments
     """
     parts = cron_str.strip().split()
 
     if len(parts) != 5:
         raise ValueError(f"Invalid cron expression: {cron_str}. Must have 5 parts.")
 
-    return {
-        'minute': parts[0],
-        'hour': parts[1],
-        'day_of_month': parts[2],
-        'month_of_year': parts[3],
-        'day_of_week': parts[4],
-    }
+    return tuple(parts)
 
 
 def get_or_create_crontab_schedule(cron_str):
@@ -46,8 +49,9 @@ def get_or_create_crontab_schedule(cron_str):
     Returns:
         CrontabSchedule instance
     """
-    cron_parts = parse_cron_expression(cron_str)
-    schedule, created = CrontabSchedule.objects.get_or_create(**cron_parts)
+    schedule, created = CrontabSchedule.objects.get_or_create(
+        **dict(zip(CRON_FIELDS, parse_cron_expression(cron_str)))
+    )
 
     if created:
         logger.info(f"Created new CrontabSchedule: {cron_str}")
@@ -55,6 +59,10 @@ def get_or_create_crontab_schedule(cron_str):
     return schedule
 
 
+# FunctionTrigger fields that feed the PeriodicTask (schedule, kwargs, enabled, description)
+PERIODIC_TASK_FIELDS = frozenset({'schedule', 'enabled', 'trigger_type', 'function', 'name'})
+
+
 @receiver(post_save, sender=FunctionTrigger)
 def manage_scheduled_trigger(sender, instance, created, **kwargs):
     """
@@ -64,6 +72,12 @@ def manage_scheduled_trigger(sender, instance, created, **kwargs):
     - Updates existing PeriodicTask when trigger is modified
     - Deletes PeriodicTask when trigger is disabled or changed to non-scheduled
     """
+    # Skip saves limited to fields the PeriodicTask doesn't depend on
+    # (e.g. save(update_fields=['last_triggered_at']))
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not (PERIODIC_TASK_FIELDS & set(update_fields)):
+        return
+
     # Unique task name based on trigger UUID
     task_name = f"trigger-{instance.uuid}"
 
@@ -92,16 +106,32 @@ def manage_scheduled_trigger(sender, instance, created, **kwargs):
             # Only enable the PeriodicTask if the function is deployed and active
             task_enabled = instance.function.status == 'active'
 
+            task_defaults = {
+                'crontab': crontab_schedule,
+                'task': 'functions.tasks.invoke_function_task',
+                'kwargs': json.dumps(task_kwargs, separators=(',', ':')),  # Compact separators: smaller beat rows
+                'enabled': task_enabled,
+                'description': f"Scheduled trigger: {instance.name} for function {instance.function.name}"
+            }
+
+            # Skip the write when nothing changed - every PeriodicTask save makes
+            # the beat scheduler reload its whole schedule
+            existing = PeriodicTask.objects.filter(name=task_name).only(
+                'crontab_id', 'task', 'kwargs', 'enabled', 'description'
+            ).first()
+            if (existing is not None
+                    and existing.crontab_id == crontab_schedule.pk
+                    and existing.task == task_defaults['task']
+                    and existing.kwargs == task_defaults['kwargs']
+                    and existing.enabled == task_enabled
+                    and existing.description == task_defaults['description']):
+                logger.debug(f"PeriodicTask '{task_name}' for trigger {instance.uuid} is up to date")
+                return
+
             # Create or update the PeriodicTask
             periodic_task, task_created = PeriodicTask.objects.update_or_create(
                 name=task_name,
-                defaults={
-                    'crontab': crontab_schedule,
-                    'task': 'functions.tasks.invoke_function_task',
-                    'kwargs': json.dumps(task_kwargs),
-                    'enabled': task_enabled,
-                    'description': f"Scheduled trigger: {instance.name} for function {instance.function.name}"
-                }
+                defaults=task_defaults
             )
 
             if task_created:
@@ -139,8 +169,8 @@ def delete_scheduled_trigger(sender, instance, **kwargs):
         logger.error(f"Failed to delete PeriodicTask for trigger {instance.uuid}: {e}", exc_info=True)
 
 
-@receiver(post_save, sender=Function)
-def disable_triggers_on_undeploy(sender, instance, created, **kwargs):
+@receiver(post_save, sender=Function, dispatch_uid='disable_triggers_on_undeploy')
+def disable_triggers_on_undeploy(sender, instance, created, update_fields=None, **kwargs):
     """
     Automatically disable PeriodicTasks when a function is undeployed.
 
@@ -154,6 +184,10 @@ def disable_triggers_on_undeploy(sender, instance, created, **kwargs):
     if created:
         return
 
+    # Skip saves that didn't touch status (e.g. deployment bookkeeping)
+    if update_fields and 'status' not in update_fields:
+        return
+
     # Only act when function is NOT active (undeployed, draft, error, etc.)
     if instance.status == 'active':
         return
@@ -165,31 +199,66 @@ def disable_triggers_on_undeploy(sender, instance, created, **kwargs):
             trigger_type='scheduled'
         )
 
-        if not triggers.exists():
+        # One SELECT of plain tuples; an empty result short-circuits below
+        trigger_rows = list(triggers.values_list('uuid', 'enabled', 'name'))
+        if not trigger_rows:
             return
 
+        # Bulk UPDATEs: no per-trigger save(), so manage_scheduled_trigger doesn't
+        # re-run for triggers we are disabling
+        enabled_uuids = [trigger_uuid for trigger_uuid, enabled, _ in trigger_rows if enabled]
         updated_count = 0
+        if enabled_uuids:
+            updated_count = FunctionTrigger.objects.filter(uuid__in=enabled_uuids).update(enabled=False)
+            for trigger_uuid, enabled, name in trigger_rows:
+                if enabled:
+                    logger.info(f"Disabled trigger '{name}' and PeriodicTask 'trigger-{trigger_uuid}' (function undeployed, status: {instance.status})")
 
-        for trigger in triggers:
-            task_name = f"trigger-{trigger.uuid}"
-
-            try:
-                # Disable both the FunctionTrigger and PeriodicTask
-                if trigger.enabled:
-                    trigger.enabled = False
-                    trigger.save(update_fields=['enabled'])
-                    updated_count += 1
-                    logger.info(f"Disabled trigger '{trigger.name}' and PeriodicTask '{task_name}' (function undeployed, status: {instance.status})")
-
-                # Also ensure PeriodicTask is disabled
-                PeriodicTask.objects.filter(name=task_name).update(enabled=False)
-
-            except Exception as e:
-                logger.error(f"Failed to disable trigger {trigger.uuid}: {e}")
-                continue
+        # Also ensure the PeriodicTasks are disabled
+        PeriodicTask.objects.filter(
+            name__in=[f"trigger-{trigger_uuid}" for trigger_uuid, _, _ in trigger_rows]
+        ).update(enabled=False)
 
         if updated_count > 0:
             logger.info(f"Auto-disabled {updated_count} PeriodicTasks for undeployed function {instance.name}")
 
     except Exception as e:
         logger.error(f"Failed to disable triggers for function {instance.uuid}: {e}", exc_info=True)
+
+
+def _touch_functions(queryset):
+    """Bump secrets_version so workers drop their cached decrypted secrets for these functions"""
+    queryset.update(secrets_version=F('secrets_version') + 1)
+
+
+@receiver(post_save, sender=Secret)
+@receiver(pre_delete, sender=Secret)
+def invalidate_secrets_on_secret_change(sender, instance, **kwargs):
+    """
+    Invalidate cached secrets of every function using a secret that was changed or deleted.
+
+    Runs pre_delete for deletions, since the m2m rows are gone by post_delete.
+    """
+    try:
+        _touch_functions(Function.objects.filter(secrets=instance))
+    except Exception as e:
+        logger.error(f"Failed to invalidate secrets cache for secret {instance.uuid}: {e}", exc_info=True)
+
+
+@receiver(m2m_changed, sender=Function.secrets.through)
+def invalidate_secrets_on_attach(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidate cached secrets when secrets are attached to or detached from a function.
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    try:
+        if not reverse:
+            _touch_functions(Function.objects.filter(pk=instance.pk))
+        elif action == 'pre_clear':
+            _touch_functions(Function.objects.filter(secrets=instance))
+        else:
+            _touch_functions(Function.objects.filter(pk__in=pk_set))
+    except Exception as e:
+        logger.error(f"Failed to invalidate secrets cache after {action}: {e}", exc_info=True)
@@ -2,14 +2,61 @@
 Celery tasks for asynchronous function operations.
 """
 from celery import shared_task
+from collections import OrderedDict
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.conf import settings
+import json
 import logging
+import redis
+import subprocess
 import time
 import uuid as uuid_module
 
+from depsets.models import DepsetPackage
+from functions.kubernetes import RUNTIME_IMAGES, k8s
+from functions.models import Function, FunctionInvocation
+from vault.models import Secret
+
 logger = logging.getLogger(__name__)
 
+# Version specs starting with one of these are passed through unchanged
+_OP_PREFIXES = ('==', '>=', '<=', '>', '<', '~', '^', '@')
+
+# Bare version -> install spec, per depset runtime type (python is the fallback)
+_FORMATTERS = {
+    'python': lambda name, version: f"{name}=={version}",
+    'nodejs': lambda name, version: f"{name}@{version}",
+    'ruby': lambda name, version: f"{name} -v {version}",
+}
+
+# Decrypted secrets per function UUID, tagged with the Function.secrets_version they were
+# built for. functions.signals bumps secrets_version whenever an attached secret changes,
+# so a stale entry is detected by every worker process, not just the one that saved.
+# Least recently used entries are evicted past SECRETS_CACHE_SIZE.
+SECRETS_CACHE_SIZE = 256
+_secrets_cache = OrderedDict()
+
+
+def _load_secrets(func):
+    """Return the function's decrypted secrets as {key: value}, memoized per worker"""
+
+    cached = _secrets_cache.get(func.uuid)
+    if cached is not None and cached[0] == func.secrets_version:
+        _secrets_cache.move_to_end(func.uuid)
+        return cached[1]
+
+    secrets_dict = Secret.bulk_get_values(func.secrets.all())
+
+    _secrets_cache[func.uuid] = (func.secrets_version, secrets_dict)
+    _secrets_cache.move_to_end(func.uuid)
+    while len(_secrets_cache) > SECRETS_CACHE_SIZE:
+        _secrets_cache.popitem(last=False)
+    return secrets_dict
+
 
 @shared_task(bind=True, max_retries=3)
 def deploy_function_task(self, function_uuid: str):
@@ -22,8 +69,6 @@ def deploy_function_task(self, function_uuid: str):
     Returns:
         dict with deployment info (deployment_name, service_name, status)
     """
-    from functions.models import Function
-    from functions.kubernetes import KubernetesManager
 
     try:
         func = Function.objects.get(uuid=function_uuid)
@@ -36,31 +81,27 @@ def deploy_function_task(self, function_uuid: str):
 
         # Get dependencies from depsets
         depset_packages = []
-        for depset in func.depsets.prefetch_related('packages').all():
-            runtime_type = depset.runtime_type
-            for pkg in depset.packages.all().order_by('order'):
+        depsets = func.depsets.prefetch_related(
+            Prefetch('packages', queryset=DepsetPackage.objects.order_by('order'))
+        )
+        for depset in depsets:
+            # Version formatter depends only on the depset's runtime, pick it once
+            format_package = _FORMATTERS.get(depset.runtime_type, _FORMATTERS['python'])
+            for pkg in depset.packages.all():  # Already ordered by the prefetch
                 if pkg.version_spec:
-                    # Format based on runtime type
                     version = pkg.version_spec.strip()
 
                     # If version already has operator/prefix, use as-is (backward compatibility)
-                    if version.startswith(('==', '>=', '<=', '>', '<', '~', '^', '@')):
+                    if version.startswith(_OP_PREFIXES):
                         depset_packages.append(f"{pkg.package_name}{version}")
                     else:
                         # Auto-format based on runtime
-                        if runtime_type == 'python':
-                            depset_packages.append(f"{pkg.package_name}=={version}")
-                        elif runtime_type == 'nodejs':
-                            depset_packages.append(f"{pkg.package_name}@{version}")
-                        elif runtime_type == 'ruby':
-                            depset_packages.append(f"{pkg.package_name} -v {version}")
-                        else:
-                            depset_packages.append(f"{pkg.package_name}=={version}")
+                        depset_packages.append(format_package(pkg.package_name, version))
                 else:
                     depset_packages.append(pkg.package_name)
 
         # Deploy using Kubernetes manager
-        k8s_manager = KubernetesManager()
+        k8s_manager = k8s()
         deployment = k8s_manager.deploy_function(
             function_id=str(func.uuid),
             runtime=func.runtime,
@@ -77,7 +118,10 @@ def deploy_function_task(self, function_uuid: str):
         func.k8s_namespace = settings.KUBERNETES_NAMESPACE
         func.status = 'active'
         func.last_deployed_at = timezone.now()
-        func.save()
+        # Named fields only: secrets_version may have been bumped while deploying
+        func.save(update_fields=[
+            'deployment_name', 'service_name', 'k8s_namespace', 'status', 'last_deployed_at', 'updated_at'
+        ])
 
         logger.info(f"[TASK] Successfully deployed function {function_uuid} to {deployment['deployment_name']}")
 
@@ -122,8 +166,6 @@ def undeploy_function_task(self, function_uuid: str):
     Returns:
         dict with success status
     """
-    from functions.models import Function
-    from functions.kubernetes import KubernetesManager
 
     try:
         func = Function.objects.get(uuid=function_uuid)
@@ -136,7 +178,7 @@ def undeploy_function_task(self, function_uuid: str):
 
         # Undeploy using Kubernetes manager
         if func.deployment_name:
-            k8s_manager = KubernetesManager()
+            k8s_manager = k8s()
             k8s_manager.delete_function(deployment_name=func.deployment_name)
 
         # Update function status
@@ -144,7 +186,8 @@ def undeploy_function_task(self, function_uuid: str):
         func.service_name = None
         func.k8s_namespace = None
         func.status = 'draft'
-        func.save()
+        # Named fields only: secrets_version may have been bumped while undeploying
+        func.save(update_fields=['deployment_name', 'service_name', 'k8s_namespace', 'status', 'updated_at'])
 
         logger.info(f"[TASK] Successfully undeployed function {function_uuid}")
 
@@ -172,99 +215,204 @@ def undeploy_function_task(self, function_uuid: str):
         return {'success': False, 'error': str(e)}
 
 
-@shared_task(bind=True)
-def test_function_task(self, function_uuid: str, event_data: dict):
+# Redis list of finished invocation results waiting for flush_invocations_task
+# (used when INVOCATION_RESULT_FLUSH_SECONDS > 0)
+INVOCATION_RESULTS_KEY = 'fnbox:invocation-results'
+
+# Redis hash of per-function counts of buffered results ("<function_id>:finished" and
+# "<function_id>:failed"). Their rows still say 'running' until flushed, so the
+# concurrency gate and circuit breaker in _run_invocation correct for these.
+# Counts change in the same transaction as the list; the TTL (refreshed on every
+# write) is a backstop so counts can't outlive the buffer if they ever drift.
+INVOCATION_BUFFERED_KEY = 'fnbox:invocation-buffered'
+INVOCATION_BUFFERED_TTL = 24 * 60 * 60
+
+# FunctionInvocation fields written when an invocation finishes
+_INVOCATION_RESULT_FIELDS = [
+    'status', 'output_data', 'error_message', 'logs', 'duration_ms', 'memory_used_mb', 'completed_at'
+]
+
+_redis = None
+
+
+def _redis_client():
+    """Return the process-wide Redis client for the invocation results buffer"""
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL)
+    return _redis
+
+
+def _count_buffered(pipe, raw_entries, delta):
+    """Queue HINCRBYs on pipe adding delta per buffered result to its function's counts"""
+    counts = {}
+    for raw in raw_entries:
+        entry = json.loads(raw)
+        fields = [f"{entry['function_id']}:finished"]
+        if entry['status'] == 'error':
+            fields.append(f"{entry['function_id']}:failed")
+        for field in fields:
+            counts[field] = counts.get(field, 0) + delta
+
+    for field, count in counts.items():
+        pipe.hincrby(INVOCATION_BUFFERED_KEY, field, count)
+    pipe.expire(INVOCATION_BUFFERED_KEY, INVOCATION_BUFFERED_TTL)
+
+
+def _record_invocation_result(invocation, count_invocation: bool):
     """
-    Async task to test invoke a function.
+    Persist a finished invocation and, if count_invocation, bump its function's stats.
 
-    Args:
-        function_uuid: UUID of the function to test
-        event_data: Event data to pass to the function
+    With INVOCATION_RESULT_FLUSH_SECONDS > 0 the result is pushed to Redis and
+    written later in bulk by flush_invocations_task, taking both UPDATEs off the
+    worker's critical path. Falls back to writing directly if Redis is unavailable.
+    """
+
+    if getattr(settings, 'INVOCATION_RESULT_FLUSH_SECONDS', 0) > 0:
+        entry = {field: getattr(invocation, field) for field in _INVOCATION_RESULT_FIELDS}
+        entry.update(
+            id=invocation.id,
+            function_id=invocation.function_id,
+            count_invocation=count_invocation,
+            completed_at=invocation.completed_at.isoformat(),
+        )
+        raw = json.dumps(entry)
+        try:
+            # MULTI/EXEC: the result and its counts are buffered together
+            pipe = _redis_client().pipeline()
+            pipe.rpush(INVOCATION_RESULTS_KEY, raw)
+            _count_buffered(pipe, [raw], 1)
+            pipe.execute()
+            return
+        except Exception as e:
+            logger.warning(f"[TASK] Failed to buffer result of invocation {invocation.id}, saving directly: {e}")
+
+    invocation.save(update_fields=_INVOCATION_RESULT_FIELDS)
+
+    if count_invocation:
+        # Atomic increment; skips Function post_save receivers
+        Function.objects.filter(pk=invocation.function_id).update(
+            invocation_count=F('invocation_count') + 1,
+            last_invoked_at=timezone.now()
+        )
+
+
+def _buffered_counts(function_id):
+    """
+    Return (finished, failed) buffered results of a function not yet flushed to the database.
+
+    Always (0, 0) when buffering is disabled or Redis is unavailable.
+    """
+
+    if getattr(settings, 'INVOCATION_RESULT_FLUSH_SECONDS', 0) <= 0:
+        return 0, 0
+
+    try:
+        finished, failed = _redis_client().hmget(
+            INVOCATION_BUFFERED_KEY, f"{function_id}:finished", f"{function_id}:failed"
+        )
+    except Exception as e:
+        logger.warning(f"[TASK] Failed to read buffered invocation counts for function {function_id}: {e}")
+        return 0, 0
+
+    return max(int(finished or 0), 0), max(int(failed or 0), 0)
+
+
+def _invocation_count(**filters):
+    """Correlated COUNT of the outer Function's invocations matching filters (0 if none)"""
+
+    return Coalesce(Subquery(
+        FunctionInvocation.objects.filter(function=OuterRef('pk'), **filters)
+        .order_by()
+        .values('function')
+        .annotate(count=Count('id'))
+        .values('count')
+    ), 0)
+
+
+def _run_invocation(function_uuid: str, event_data: dict, request_id: str = None, *, source: str):
+    """
+    Run one invocation of a deployed function and record it as a FunctionInvocation.
+
+    Shared by test_function_task (source='test') and invoke_function_task
+    (source='invoke'); they only differ in wording of errors and logs.
 
     Returns:
         dict with invocation ID for polling
     """
-    from functions.models import Function, FunctionInvocation
-    from functions.kubernetes import KubernetesManager
+
+    label = 'test invocation' if source == 'test' else 'invocation'
 
     try:
-        func = Function.objects.get(uuid=function_uuid)
+        # Fetch the function together with the circuit-breaker and concurrency
+        # counters in a single round-trip
+        cutoff = timezone.now() - timezone.timedelta(minutes=5)
+        func = Function.objects.annotate(
+            recent_total=_invocation_count(created_at__gte=cutoff),
+            recent_failures=_invocation_count(created_at__gte=cutoff, status='error'),
+            running=_invocation_count(status__in=['pending', 'running']),
+        ).get(uuid=function_uuid)
+
+        # Buffered results are still 'running' in the database until flushed
+        buffered_finished, buffered_failed = _buffered_counts(func.id)
+        func.running = max(func.running - buffered_finished, 0)
+        func.recent_failures += buffered_failed
 
         # Check if function is deployed
         if func.status != 'active' or not func.service_name:
             return {
                 'success': False,
-                'error': 'Function must be deployed before testing',
+                'error': 'Function must be deployed before testing' if source == 'test' else 'Function is not deployed',
                 'invocation_id': None
             }
 
         # Circuit breaker: check recent failure rate to prevent resource exhaustion
-        recent_invocations = FunctionInvocation.objects.filter(
-            function=func,
-            created_at__gte=timezone.now() - timezone.timedelta(minutes=5)
-        ).order_by('-created_at')[:10]
-
-        if recent_invocations.count() >= 10:
-            failures = sum(1 for inv in recent_invocations if inv.status == 'error')
-            if failures >= 8:  # 80% failure rate
-                logger.warning(f"[CIRCUIT BREAKER] Function {function_uuid} has high failure rate ({failures}/10), throttling")
-                return {
-                    'success': False,
-                    'error': 'Function has high failure rate. Please check function code and try again later.',
-                    'invocation_id': None
-                }
+        if func.recent_total >= 10 and func.recent_failures * 10 >= func.recent_total * 8:  # 80% failure rate
+            logger.warning(f"[CIRCUIT BREAKER] Function {function_uuid} has high failure rate ({func.recent_failures}/{func.recent_total}), throttling")
+            return {
+                'success': False,
+                'error': 'Function has high failure rate. Please check function code and try again later.',
+                'invocation_id': None
+            }
 
         # Check for too many concurrent invocations
-        running_invocations = FunctionInvocation.objects.filter(
-            function=func,
-            status__in=['pending', 'running']
-        ).count()
-
-        if running_invocations >= 5:
-            logger.warning(f"[RATE LIMIT] Function {function_uuid} has {running_invocations} concurrent invocations, rejecting")
+        if func.running >= 5:
+            logger.warning(f"[RATE LIMIT] Function {function_uuid} has {func.running} concurrent invocations, rejecting")
             return {
                 'success': False,
-                'error': f'Too many concurrent invocations ({running_invocations}). Please wait for previous invocations to complete.',
+                'error': f'Too many concurrent invocations ({func.running}). Please wait for previous invocations to complete.',
                 'invocation_id': None
             }
 
         start_time = time.time()
-        request_id = f"req-{uuid_module.uuid4().hex[:12]}"
+        if not request_id:
+            request_id = f"req-{uuid_module.uuid4().hex[:12]}"
 
         # Create invocation record
         invocation = FunctionInvocation.objects.create(
             function=func,
             request_id=request_id,
-            status='pending',
+            status='running',
             input_data=event_data,
             started_at=timezone.now()
         )
 
-        logger.info(f"[TASK] Starting test invocation {invocation.id} for function {function_uuid}")
+        logger.info(f"[TASK] Starting {label} {invocation.id} for function {function_uuid}")
 
         try:
-            invocation.status = 'running'
-            invocation.save(update_fields=['status'])
-
             # Fetch secrets for environment variables
-            secrets_dict = {}
-            for secret in func.secrets.all():
-                try:
-                    secrets_dict[secret.key] = secret.get_value()
-                except Exception as e:
-                    logger.warning(f"Failed to decrypt secret {secret.id} for function {func.uuid}: {e}")
-
-            # Add secrets to event context
-            event_with_secrets = {
-                **event_data,
-                '__secrets__': secrets_dict
-            }
+            secrets_dict = _load_secrets(func)
+
+            # Add secrets to event context. event_data is owned by this task, so it is
+            # updated in place rather than copied; input_data was already INSERTed
+            # without secrets and result saves never write it back.
+            event_data['__secrets__'] = secrets_dict
 
             # Invoke function via Kubernetes service
-            k8s_manager = KubernetesManager()
+            k8s_manager = k8s()
             invocation_result = k8s_manager.invoke_function(
                 service_name=func.service_name,
-                event=event_with_secrets,
+                event=event_data,
                 timeout_seconds=func.timeout_seconds,
                 code=func.code,
                 handler=func.handler
@@ -280,14 +428,11 @@ def test_function_task(self, function_uuid: str, event_data: dict):
             invocation.duration_ms = int(invocation_result.get('execution_time_ms', execution_time))
             invocation.memory_used_mb = invocation_result.get('memory_used_mb')
             invocation.completed_at = timezone.now()
-            invocation.save()
 
-            # Update function statistics
-            func.invocation_count += 1
-            func.last_invoked_at = timezone.now()
-            func.save(update_fields=['invocation_count', 'last_invoked_at'])
+            # Save results and update function statistics (possibly deferred to the flusher)
+            _record_invocation_result(invocation, count_invocation=True)
 
-            logger.info(f"[TASK] Test invocation {invocation.id} completed successfully")
+            logger.info(f"[TASK] {label.capitalize()} {invocation.id} completed successfully")
 
             return {
                 'success': True,
@@ -302,9 +447,9 @@ def test_function_task(self, function_uuid: str, event_data: dict):
             invocation.error_message = str(e)
             invocation.duration_ms = int(execution_time)
             invocation.completed_at = timezone.now()
-            invocation.save()
+            _record_invocation_result(invocation, count_invocation=False)
 
-            logger.error(f"[TASK] Test invocation {invocation.id} failed: {str(e)}", exc_info=True)
+            logger.error(f"[TASK] {label.capitalize()} {invocation.id} failed: {str(e)}", exc_info=True)
 
             return {
                 'success': False,
@@ -321,7 +466,7 @@ def test_function_task(self, function_uuid: str, event_data: dict):
         }
 
     except Exception as e:
-        logger.error(f"[TASK] Failed to test function {function_uuid}: {str(e)}", exc_info=True)
+        logger.error(f"[TASK] Failed to {source} function {function_uuid}: {str(e)}", exc_info=True)
         return {
             'success': False,
             'error': str(e),
@@ -329,6 +474,21 @@ def test_function_task(self, function_uuid: str, event_data: dict):
         }
 
 
+@shared_task(bind=True)
+def test_function_task(self, function_uuid: str, event_data: dict):
+    """
+    Async task to test invoke a function.
+
+    Args:
+        function_uuid: UUID of the function to test
+        event_data: Event data to pass to the function
+
+    Returns:
+        dict with invocation ID for polling
+    """
+    return _run_invocation(function_uuid, event_data, source='test')
+
+
 @shared_task(bind=True)
 def invoke_function_task(self, function_uuid: str, event_data: dict, request_id: str = None):
     """
@@ -342,150 +502,125 @@ def invoke_function_task(self, function_uuid: str, event_data: dict, request_id:
     Returns:
         dict with invocation ID for polling
     """
-    from functions.models import Function, FunctionInvocation
-    from functions.kubernetes import KubernetesManager
+    return _run_invocation(function_uuid, event_data, request_id, source='invoke')
 
-    try:
-        func = Function.objects.get(uuid=function_uuid)
 
-        # Check if function is deployed
-        if func.status != 'active' or not func.service_name:
-            return {
-                'success': False,
-                'error': 'Function is not deployed',
-                'invocation_id': None
-            }
+@shared_task(bind=True)
+def flush_invocations_task(self, batch_size: int = 500):
+    """
+    Periodic task to write buffered invocation results to the database.
 
-        # Circuit breaker: check recent failure rate to prevent resource exhaustion
-        recent_invocations = FunctionInvocation.objects.filter(
-            function=func,
-            created_at__gte=timezone.now() - timezone.timedelta(minutes=5)
-        ).order_by('-created_at')[:10]
-
-        if recent_invocations.count() >= 10:
-            failures = sum(1 for inv in recent_invocations if inv.status == 'error')
-            if failures >= 8:  # 80% failure rate
-                logger.warning(f"[CIRCUIT BREAKER] Function {function_uuid} has high failure rate ({failures}/10), throttling")
-                return {
-                    'success': False,
-                    'error': 'Function has high failure rate. Please check function code and try again later.',
-                    'invocation_id': None
-                }
+    Pops up to batch_size results at a time from Redis, bulk-updates the
+    FunctionInvocation rows and applies one statistics UPDATE per function.
 
-        # Check for too many concurrent invocations
-        running_invocations = FunctionInvocation.objects.filter(
-            function=func,
-            status__in=['pending', 'running']
-        ).count()
+    Args:
+        batch_size: Maximum number of results written per bulk UPDATE
 
-        if running_invocations >= 5:
-            logger.warning(f"[RATE LIMIT] Function {function_uuid} has {running_invocations} concurrent invocations, rejecting")
-            return {
-                'success': False,
-                'error': f'Too many concurrent invocations ({running_invocations}). Please wait for previous invocations to complete.',
-                'invocation_id': None
-            }
+    Returns:
+        dict with number of flushed results
+    """
 
-        start_time = time.time()
-        if not request_id:
-            request_id = f"req-{uuid_module.uuid4().hex[:12]}"
+    redis_client = _redis_client()
+    total_flushed = 0
 
-        # Create invocation record
-        invocation = FunctionInvocation.objects.create(
-            function=func,
-            request_id=request_id,
-            status='pending',
-            input_data=event_data,
-            started_at=timezone.now()
-        )
+    def take_batch(pipe):
+        # Runs under WATCH on the list: the batch leaves the buffer and stops being
+        # counted in one transaction, retried if a worker pushes in between
+        raw_entries = pipe.lrange(INVOCATION_RESULTS_KEY, 0, batch_size - 1)
+        pipe.multi()
+        pipe.ltrim(INVOCATION_RESULTS_KEY, len(raw_entries), -1)
+        _count_buffered(pipe, raw_entries, -1)
+        return raw_entries
 
-        logger.info(f"[TASK] Starting invocation {invocation.id} for function {function_uuid}")
+    while True:
+        raw_entries = redis_client.transaction(take_batch, INVOCATION_RESULTS_KEY, value_from_callable=True)
+        if not raw_entries:
+            break
 
         try:
-            invocation.status = 'running'
-            invocation.save(update_fields=['status'])
+            invocations = []
+            function_stats = {}  # function_id -> (invocations to add, latest completion)
+            for raw in raw_entries:
+                entry = json.loads(raw)
+                entry['completed_at'] = parse_datetime(entry['completed_at'])
+                invocations.append(FunctionInvocation(
+                    id=entry['id'],
+                    **{field: entry[field] for field in _INVOCATION_RESULT_FIELDS}
+                ))
+
+                if entry['count_invocation']:
+                    count, last_invoked_at = function_stats.get(entry['function_id'], (0, None))
+                    completed_at = entry['completed_at']
+                    function_stats[entry['function_id']] = (
+                        count + 1,
+                        max(last_invoked_at, completed_at) if last_invoked_at else completed_at
+                    )
+
+            # All or nothing, so a retried batch doesn't count invocations twice
+            with transaction.atomic():
+                FunctionInvocation.objects.bulk_update(invocations, _INVOCATION_RESULT_FIELDS, batch_size=batch_size)
+
+                for function_id, (count, last_invoked_at) in function_stats.items():
+                    Function.objects.filter(pk=function_id).update(
+                        invocation_count=F('invocation_count') + count,
+                        last_invoked_at=last_invoked_at
+                    )
 
-            # Fetch secrets for environment variables
-            secrets_dict = {}
-            for secret in func.secrets.all():
-                try:
-                    secrets_dict[secret.key] = secret.get_value()
-                except Exception as e:
-                    logger.warning(f"Failed to decrypt secret {secret.id} for function {func.uuid}: {e}")
-
-            # Add secrets to event context
-            event_with_secrets = {
-                **event_data,
-                '__secrets__': secrets_dict
-            }
+        except Exception as e:
+            # Put the batch back (and count it again) so the next run retries it
+            pipe = redis_client.pipeline()
+            pipe.lpush(INVOCATION_RESULTS_KEY, *reversed(raw_entries))
+            _count_buffered(pipe, raw_entries, 1)
+            pipe.execute()
+            logger.error(f"[TASK] Failed to flush invocation results: {str(e)}", exc_info=True)
+            return {'success': False, 'error': str(e), 'flushed': total_flushed}
 
-            # Invoke function via Kubernetes service
-            k8s_manager = KubernetesManager()
-            invocation_result = k8s_manager.invoke_function(
-                service_name=func.service_name,
-                event=event_with_secrets,
-                timeout_seconds=func.timeout_seconds,
-                code=func.code,
-                handler=func.handler
-            )
+        total_flushed += len(raw_entries)
+        if len(raw_entries) < batch_size:
+            break
 
-            execution_time = (time.time() - start_time) * 1000
+    if total_flushed:
+        logger.info(f"[TASK] Flushed {total_flushed} buffered invocation results")
+    return {'success': True, 'flushed': total_flushed}
 
-            # Update invocation record with results
-            invocation.status = 'success' if invocation_result.get('success', True) else 'error'
-            invocation.output_data = invocation_result.get('result')
-            invocation.error_message = invocation_result.get('error', '')
-            invocation.logs = invocation_result.get('logs', '')
-            invocation.duration_ms = int(invocation_result.get('execution_time_ms', execution_time))
-            invocation.memory_used_mb = invocation_result.get('memory_used_mb')
-            invocation.completed_at = timezone.now()
-            invocation.save()
 
-            # Update function statistics
-            func.invocation_count += 1
-            func.last_invoked_at = timezone.now()
-            func.save(update_fields=['invocation_count', 'last_invoked_at'])
+@shared_task(bind=True)
+def prune_invocations_task(self, batch_size: int = 5000):
+    """
+    Periodic task to delete invocation records older than INVOCATION_RETENTION_DAYS.
 
-            logger.info(f"[TASK] Invocation {invocation.id} completed successfully")
+    Rows are deleted in primary-key batches so each DELETE stays short and
+    doesn't hold locks on the invocations table for the whole prune.
 
-            return {
-                'success': True,
-                'invocation_id': invocation.id
-            }
+    Args:
+        batch_size: Maximum number of rows removed per DELETE statement
 
-        except Exception as e:
-            execution_time = (time.time() - start_time) * 1000
+    Returns:
+        dict with number of deleted rows
+    """
 
-            # Update invocation record with error
-            invocation.status = 'error'
-            invocation.error_message = str(e)
-            invocation.duration_ms = int(execution_time)
-            invocation.completed_at = timezone.now()
-            invocation.save()
+    retention_days = getattr(settings, 'INVOCATION_RETENTION_DAYS', 0)
+    if retention_days <= 0:
+        return {'success': True, 'deleted': 0}
 
-            logger.error(f"[TASK] Invocation {invocation.id} failed: {str(e)}", exc_info=True)
+    try:
+        cutoff = timezone.now() - timezone.timedelta(days=retention_days)
+        expired = FunctionInvocation.objects.filter(created_at__lt=cutoff).order_by()
 
-            return {
-                'success': False,
-                'error': str(e),
-                'invocation_id': invocation.id
-            }
+        total_deleted = 0
+        while True:
+            batch_ids = list(expired.values_list('id', flat=True)[:batch_size])
+            if not batch_ids:
+                break
+            deleted, _ = FunctionInvocation.objects.filter(id__in=batch_ids).delete()
+            total_deleted += deleted
 
-    except Function.DoesNotExist:
-        logger.error(f"[TASK] Function {function_uuid} not found")
-        return {
-            'success': False,
-            'error': 'Function not found',
-            'invocation_id': None
-        }
+        logger.info(f"[TASK] Pruned {total_deleted} invocations older than {retention_days} days")
+        return {'success': True, 'deleted': total_deleted}
 
     except Exception as e:
-        logger.error(f"[TASK] Failed to invoke function {function_uuid}: {str(e)}", exc_info=True)
-        return {
-            'success': False,
-            'error': str(e),
-            'invocation_id': None
-        }
+        logger.error(f"[TASK] Failed to prune invocations: {str(e)}", exc_info=True)
+        return {'success': False, 'error': str(e)}
 
 
 @shared_task(bind=True)
@@ -497,8 +632,6 @@ def reload_kind_images_task(self):
     This runs periodically to handle cases where the cluster loses access to images
     (e.g., after cluster restart, image pruning, or node reset).
     """
-    import subprocess
-    from functions.kubernetes import RUNTIME_IMAGES
 
     try:
         cluster_name = getattr(settings, 'KIND_CLUSTER_NAME', 'fnbox-cluster')
@@ -1,3 +1,247 @@
-from django.test import TestCase
+import uuid
+from unittest import mock
 
-# Create your tests here.
+import fakeredis
+from django.contrib.auth.models import User
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from kubernetes.client.rest import ApiException
+
+from functions import tasks
+from functions.kubernetes import FIELD_MANAGER, KubernetesManager
+from functions.models import Function, FunctionInvocation
+from users.models import Team
+
+APPLY = 'application/apply-patch+yaml'
+JSON_PATCH = 'application/json-patch+json'
+
+
+def make_function(**kwargs):
+    owner = User.objects.create_user('owner', 'owner@example.com', 'password')
+    team = Team.objects.create(name='Team', slug='team', owner=owner)
+    return Function.objects.create(
+        name='Demo', slug='demo', team=team, code='def handler(event, context): pass',
+        status='active', deployment_name='fn-demo', service_name='fn-demo', **kwargs
+    )
+
+
+def managed_entry(manager, operation, fields, subresource=None):
+    entry = {
+        'manager': manager,
+        'operation': operation,
+        'apiVersion': 'apps/v1',
+        'fieldsType': 'FieldsV1',
+        'fieldsV1': fields,
+    }
+    if subresource:
+        entry['subresource'] = subresource
+    return entry
+
+
+class ServerSideApplyAdoptionTests(SimpleTestCase):
+    """KubernetesManager._apply adopting fields owned by pre-SSA managers"""
+
+    def setUp(self):
+        # Skip __init__, which loads kubeconfig
+        self.manager = KubernetesManager.__new__(KubernetesManager)
+        self.manager.namespace = 'fnbox-functions'
+        self.api_client = mock.Mock()
+        self.api_client.sanitize_for_serialization.side_effect = lambda obj: obj
+        self.manager.core_v1 = mock.Mock(api_client=self.api_client)
+
+        self.ours = managed_entry(FIELD_MANAGER, 'Apply', {'f:spec': {'f:replicas': {}}})
+        self.status = managed_entry('kube-controller-manager', 'Update', {'f:status': {}}, subresource='status')
+
+    def respond(self, *apply_results, patch_error=None):
+        """Answer SSA requests with apply_results in order; JSON patches succeed unless patch_error"""
+        apply_results = iter(apply_results)
+
+        def call_api(resource_path, method, **kwargs):
+            if kwargs['header_params']['Content-Type'] == JSON_PATCH:
+                if patch_error:
+                    raise patch_error
+                return {}
+            return next(apply_results)
+
+        self.api_client.call_api.side_effect = call_api
+
+    def content_types(self):
+        return [call.kwargs['header_params']['Content-Type'] for call in self.api_client.call_api.call_args_list]
+
+    def apply(self):
+        return self.manager._apply('/apis/apps/v1/namespaces/{namespace}/deployments/{name}',
+                                   {'metadata': {'name': 'fn-demo'}}, 'object')
+
+    def test_legacy_update_entries_are_merged_and_reapplied(self):
+        legacy = managed_entry('OpenAPI-Generator', 'Update', {
+            'f:spec': {'f:template': {'f:spec': {'f:initContainers': {'k:{"name":"deps"}': {'.': {}}}}}},
+        })
+        first = {'metadata': {'resourceVersion': '7', 'managedFields': [legacy, self.status, self.ours]}}
+        second = {'metadata': {'resourceVersion': '9', 'managedFields': [self.status, self.ours]}}
+        self.respond(first, second)
+
+        self.assertIs(self.apply(), second)
+        self.assertEqual(self.content_types(), [APPLY, JSON_PATCH, APPLY])
+
+        test_op, replace_op = self.api_client.call_api.call_args_list[1].kwargs['body']
+        self.assertEqual(test_op, {'op': 'test', 'path': '/metadata/resourceVersion', 'value': '7'})
+        self.assertEqual(replace_op['path'], '/metadata/managedFields')
+
+        managers = [entry['manager'] for entry in replace_op['value']]
+        self.assertEqual(managers, ['kube-controller-manager', FIELD_MANAGER])
+        self.assertEqual(replace_op['value'][1]['fieldsV1'], {'f:spec': {
+            'f:replicas': {},
+            'f:template': {'f:spec': {'f:initContainers': {'k:{"name":"deps"}': {'.': {}}}}},
+        }})
+
+    def test_no_legacy_entries_applies_once(self):
+        applied = {'metadata': {'resourceVersion': '7', 'managedFields': [self.status, self.ours]}}
+        self.respond(applied)
+
+        self.assertIs(self.apply(), applied)
+        self.assertEqual(self.content_types(), [APPLY])
+
+    def test_resource_version_conflict_keeps_first_apply(self):
+        legacy = managed_entry('kubectl-client-side-apply', 'Update', {'f:spec': {'f:paused': {}}})
+        applied = {'metadata': {'resourceVersion': '7', 'managedFields': [legacy, self.ours]}}
+        self.respond(applied, patch_error=ApiException(status=422, reason='Unprocessable Entity'))
+
+        with self.assertLogs('functions.kubernetes', level='WARNING'):
+            self.assertIs(self.apply(), applied)
+        self.assertEqual(self.content_types(), [APPLY, JSON_PATCH])
+
+    def test_subresource_entries_are_left_alone(self):
+        # A legacy manager's status/scale entries belong to the subresource, not the manifest
+        scale = managed_entry('kubectl', 'Update', {'f:spec': {'f:replicas': {}}}, subresource='scale')
+        applied = {'metadata': {'resourceVersion': '7', 'managedFields': [scale, self.status, self.ours]}}
+        self.respond(applied)
+
+        self.assertIs(self.apply(), applied)
+        self.assertEqual(self.content_types(), [APPLY])
+
+
+class SecretsVersionTests(TestCase):
+    """Deploy bookkeeping must not write a stale secrets_version back"""
+
+    def setUp(self):
+        self.func = make_function()
+
+    def rotate_secret(self, *args, **kwargs):
+        # What functions.signals does when an attached secret changes mid-deploy
+        Function.objects.filter(pk=self.func.pk).update(secrets_version=F('secrets_version') + 1)
+        return {'deployment_name': 'fn-demo', 'service_name': 'fn-demo', 'status': 'deployed'}
+
+    @mock.patch('functions.tasks.k8s')
+    def test_deploy_keeps_concurrent_secrets_version_bump(self, k8s):
+        k8s.return_value.deploy_function.side_effect = self.rotate_secret
+
+        result = tasks.deploy_function_task(str(self.func.uuid))
+
+        self.assertTrue(result['success'])
+        self.func.refresh_from_db()
+        self.assertEqual(self.func.status, 'active')
+        self.assertEqual(self.func.secrets_version, 1)
+
+    @mock.patch('functions.tasks.k8s')
+    def test_undeploy_keeps_concurrent_secrets_version_bump(self, k8s):
+        k8s.return_value.delete_function.side_effect = self.rotate_secret
+
+        result = tasks.undeploy_function_task(str(self.func.uuid))
+
+        self.assertTrue(result['success'])
+        self.func.refresh_from_db()
+        self.assertEqual(self.func.status, 'draft')
+        self.assertEqual(self.func.secrets_version, 1)
+
+
+@override_settings(INVOCATION_RESULT_FLUSH_SECONDS=5)
+class BufferedInvocationResultTests(TestCase):
+    """Invocation results buffered in Redis until flush_invocations_task writes them"""
+
+    def setUp(self):
+        self.func = make_function()
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('functions.tasks._redis_client', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def running_invocation(self):
+        return FunctionInvocation.objects.create(
+            function=self.func, request_id=f'req-{uuid.uuid4().hex[:12]}', status='running', started_at=timezone.now()
+        )
+
+    def finish(self, invocation, status='success'):
+        """Record invocation as finished through the buffer; its row stays 'running'"""
+        invocation.status = status
+        invocation.output_data = {'ok': status == 'success'}
+        invocation.duration_ms = 12
+        invocation.completed_at = timezone.now()
+        tasks._record_invocation_result(invocation, count_invocation=True)
+
+    def test_result_is_buffered_and_counted(self):
+        invocation = self.running_invocation()
+        self.finish(invocation, status='error')
+
+        invocation.refresh_from_db()
+        self.assertEqual(invocation.status, 'running')
+        self.assertEqual(self.redis.llen(tasks.INVOCATION_RESULTS_KEY), 1)
+        self.assertEqual(tasks._buffered_counts(self.func.id), (1, 1))
+        self.assertGreater(self.redis.ttl(tasks.INVOCATION_BUFFERED_KEY), 0)
+
+    def test_flush_writes_results_and_clears_counts(self):
+        invocations = [self.running_invocation() for _ in range(3)]
+        for invocation in invocations:
+            self.finish(invocation)
+
+        result = tasks.flush_invocations_task(batch_size=2)
+
+        self.assertEqual(result, {'success': True, 'flushed': 3})
+        self.assertEqual(
+            set(FunctionInvocation.objects.values_list('status', flat=True)), {'success'}
+        )
+        self.func.refresh_from_db()
+        self.assertEqual(self.func.invocation_count, 3)
+        self.assertEqual(self.redis.llen(tasks.INVOCATION_RESULTS_KEY), 0)
+        self.assertEqual(tasks._buffered_counts(self.func.id), (0, 0))
+
+    def test_failed_flush_requeues_and_recounts(self):
+        invocation = self.running_invocation()
+        self.finish(invocation, status='error')
+
+        with mock.patch.object(FunctionInvocation.objects, 'bulk_update', side_effect=RuntimeError('db down')), \
+                self.assertLogs('functions.tasks', level='ERROR'):
+            result = tasks.flush_invocations_task()
+
+        self.assertFalse(result['success'])
+        self.assertEqual(self.redis.llen(tasks.INVOCATION_RESULTS_KEY), 1)
+        self.assertEqual(tasks._buffered_counts(self.func.id), (1, 1))
+        self.func.refresh_from_db()
+        self.assertEqual(self.func.invocation_count, 0)
+
+    @mock.patch('functions.tasks.k8s')
+    def test_concurrency_gate_ignores_buffered_results(self, k8s):
+        k8s.return_value.invoke_function.return_value = {'success': True, 'result': 1}
+        invocations = [self.running_invocation() for _ in range(5)]
+        for invocation in invocations[:2]:
+            self.finish(invocation)
+
+        # 5 rows say 'running', but only 3 invocations actually are
+        result = tasks._run_invocation(str(self.func.uuid), {}, source='invoke')
+
+        self.assertTrue(result['success'])
+        k8s.return_value.invoke_function.assert_called_once()
+
+    @mock.patch('functions.tasks.k8s')
+    def test_circuit_breaker_counts_buffered_failures(self, k8s):
+        for _ in range(7):
+            FunctionInvocation.objects.create(function=self.func, request_id=f'req-{uuid.uuid4().hex[:12]}', status='error')
+        for invocation in [self.running_invocation() for _ in range(3)]:
+            self.finish(invocation, status='error')
+
+        # 7/10 failures in the database, 10/10 once buffered results are counted
+        result = tasks._run_invocation(str(self.func.uuid), {}, source='invoke')
+
+        self.assertFalse(result['success'])
+        self.assertIn('high failure rate', result['error'])
+        k8s.return_value.invoke_function.assert_not_called()
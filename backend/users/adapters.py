@@ -1,6 +1,7 @@
 from allauth.socialaccount.adapter import DefaultSocialAccountAdapter
 from allauth.account.models import EmailAddress
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Q
 
 User = get_user_model()
 
@@ -32,27 +33,26 @@ class MySocialAccountAdapter(DefaultSocialAccountAdapter):
             # No email provided by the OIDC provider
             return
 
-        # Try to find an existing user with this email
-        try:
-            # First, try to find a verified email address
-            email_address = EmailAddress.objects.get(
-                email__iexact=email,
-                verified=True
-            )
+        # Find existing users with this email in one query: owners of a verified
+        # EmailAddress first, then users whose User.email matches
+        verified_user_ids = EmailAddress.objects.filter(
+            email__iexact=email,
+            verified=True
+        ).values('user_id')
+        candidates = list(
+            User.objects
+            .filter(Q(pk__in=verified_user_ids) | Q(email__iexact=email))
+            .annotate(has_verified_email=Exists(verified_user_ids.filter(user_id=OuterRef('pk'))))
+            .order_by('-has_verified_email', 'id')[:2]
+        )
+
+        if not candidates:
+            # No existing user with this email, will create a new account
+            return
+
+        if candidates[0].has_verified_email or len(candidates) == 1:
             # Connect this social login to the existing user
-            sociallogin.connect(request, email_address.user)
-
-        except EmailAddress.DoesNotExist:
-            # No verified email found, try to find user by email field directly
-            try:
-                user = User.objects.get(email__iexact=email)
-                # Connect this social login to the existing user
-                sociallogin.connect(request, user)
-
-            except User.DoesNotExist:
-                # No existing user with this email, will create a new account
-                pass
-            except User.MultipleObjectsReturned:
-                # Multiple users with same email (shouldn't happen in a well-configured system)
-                # Don't link to avoid ambiguity
-                pass
+            sociallogin.connect(request, candidates[0])
+
+        # Otherwise multiple users share the email without a verified address
+        # (shouldn't happen in a well-configured system) - don't link to avoid ambiguity
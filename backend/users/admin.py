@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Count
 from .models import UserProfile, Team, TeamMember
 
 
@@ -53,6 +54,7 @@ class TeamAdmin(admin.ModelAdmin):
     prepopulated_fields = {"slug": ("name",)}
     autocomplete_fields = ["owner"]
     inlines = [TeamMemberInline]
+    ordering = ("-created_at",)
 
     fieldsets = (
         (None, {
@@ -66,13 +68,14 @@ class TeamAdmin(admin.ModelAdmin):
 
     def member_count(self, obj):
         """Display the number of members in the team."""
-        return obj.members.count()
+        return obj._member_count
     member_count.short_description = "Members"
+    member_count.admin_order_field = "_member_count"
 
     def get_queryset(self, request):
-        """Optimize queryset with select_related."""
+        """Optimize queryset with select_related and an annotated member count."""
         qs = super().get_queryset(request)
-        return qs.select_related("owner").prefetch_related("members")
+        return qs.select_related("owner").annotate(_member_count=Count("members"))
 
 
 @admin.register(TeamMember)
@@ -113,6 +116,11 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ("user__username", "user__email")
     autocomplete_fields = ["user"]
 
+    def get_queryset(self, request):
+        """Optimize queryset with select_related."""
+        qs = super().get_queryset(request)
+        return qs.select_related("user")
+
 
 # Unregister the default User admin and register our custom one
 admin.site.unregister(User)
@@ -1,10 +1,13 @@
 from ninja import Router
+from django.conf import settings
 from django.middleware.csrf import get_token
-from django.http import HttpRequest
+from django.http import Http404, HttpRequest, JsonResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
 from django.utils.text import slugify
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Prefetch, Q
 from typing import List
 from .schemas import *
 from .models import UserProfile, Team, TeamMember, OIDCProvider, SiteSettings
@@ -13,13 +16,23 @@ from ninja.errors import HttpError
 
 router = Router(tags=["auth"])
 
+VALID_ROLES = frozenset(role for role, _ in TeamMember.AVAILABLE_ROLES)
+
 
 def is_admin_user(user):
     """Check if user is an administrator (staff, superuser, or custom admin)"""
     if user.is_staff or user.is_superuser:
         return True
-    profile, _ = UserProfile.objects.get_or_create(user=user)
-    return profile.is_admin
+    # Profiles are created with the user (users.signals), so this is a read-only check
+    return UserProfile.objects.filter(user=user, is_admin=True).exists()
+
+
+def get_user_roles(request, team_id):
+    """Effective roles of the requesting user in a team, or None if not a member"""
+    membership = TeamMember.objects.filter(team_id=team_id, user=request.auth).only('effective_roles').first()
+    if membership is None:
+        return None
+    return set(membership.effective_roles)
 
 
 # ======================
@@ -31,7 +44,10 @@ def get_csrf(request: HttpRequest):
     """
     Fetch CSRF token for frontend (Next.js, etc.)
     """
-    return {"csrfToken": get_token(request)}
+    # Returned as a plain JsonResponse so Ninja skips response serialization
+    response = JsonResponse({"csrfToken": get_token(request)})
+    patch_cache_control(response, private=True, max_age=0)
+    return response
 
 
 # ======================
@@ -40,6 +56,9 @@ def get_csrf(request: HttpRequest):
 
 @router.get("/status", response=AuthStatusOut)
 def auth_status(request: HttpRequest):
+    # No session cookie means anonymous; skip loading the session/user entirely
+    if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return {"isLoggedIn": False}
     return {"isLoggedIn": request.user.is_authenticated}
 
 @router.get("/me", response=MeOut, auth=session_mfa_auth)
@@ -101,7 +120,8 @@ def update_profile(request, payload: ProfileUpdateIn):
 @router.get("/users/search", response=List[UserSearchOut], auth=session_mfa_auth)
 def search_users(request, q: str = ""):
     """Search for users by email or username"""
-    if not q or len(q) < 2:
+    # Trigram indexes (users migration 0007) need at least 3 characters to be selective
+    if not q or len(q) < 3:
         return []
 
     # Search for users matching the query (case-insensitive)
@@ -110,7 +130,7 @@ def search_users(request, q: str = ""):
         models.Q(username__icontains=q) |
         models.Q(first_name__icontains=q) |
         models.Q(last_name__icontains=q)
-    )[:10]  # Limit to 10 results
+    ).only('id', 'username', 'email', 'first_name', 'last_name')[:10]  # Limit to 10 results
 
     return [
         {
@@ -130,7 +150,13 @@ def search_users(request, q: str = ""):
 def list_teams(request):
     """List all teams the authenticated user is a member of"""
     user = request.auth
-    teams = Team.objects.filter(members=user).prefetch_related('members')
+    # Annotate before filtering on members so the count uses its own join
+    # (filtering first would restrict the counted rows to this user)
+    teams = Team.objects.annotate(
+        member_count=Count('members')
+    ).filter(members=user).prefetch_related(
+        Prefetch('teammember_set', queryset=TeamMember.objects.filter(user=user), to_attr='my_membership')
+    ).order_by('-created_at')
 
     return [
         {
@@ -138,9 +164,9 @@ def list_teams(request):
             "name": team.name,
             "slug": team.slug,
             "team_type": team.team_type,
-            "member_count": team.members.count(),
+            "member_count": team.member_count,
             "is_owner": team.owner_id == user.id,
-            "my_roles": TeamMember.objects.get(team=team, user=user).roles
+            "my_roles": team.my_membership[0].roles
         }
         for team in teams
     ]
@@ -150,9 +176,17 @@ def list_teams(request):
 def get_team(request, slug: str):
     """Get detailed information about a specific team"""
     user = request.auth
-    team = get_object_or_404(Team, slug=slug, members=user)
+    team = get_object_or_404(
+        Team.objects.select_related('owner').only(
+            'id', 'name', 'slug', 'team_type', 'owner_id', 'owner__username', 'created_at', 'updated_at'
+        ),
+        slug=slug
+    )
 
-    members = TeamMember.objects.filter(team=team).select_related('user')
+    # The member list doubles as the membership check, so no separate JOIN on members
+    members = list(TeamMember.objects.filter(team=team).select_related('user'))
+    if not any(m.user_id == user.id for m in members):
+        raise Http404("No Team matches the given query.")
 
     return {
         "id": team.id,
@@ -161,7 +195,7 @@ def get_team(request, slug: str):
         "team_type": team.team_type,
         "owner_id": team.owner_id,
         "owner_username": team.owner.username,
-        "member_count": members.count(),
+        "member_count": len(members),
         "created_at": team.created_at,
         "updated_at": team.updated_at,
         "members": [
@@ -185,9 +219,11 @@ def create_team(request, payload: TeamCreateIn):
     # Auto-generate slug from name if not provided
     if not payload.slug:
         base_slug = slugify(payload.name)
+        # Fetch every colliding slug at once and pick the next free counter locally
+        taken = set(Team.objects.filter(slug__startswith=base_slug).values_list('slug', flat=True))
         slug = base_slug
         counter = 1
-        while Team.objects.filter(slug=slug).exists():
+        while slug in taken:
             slug = f"{base_slug}-{counter}"
             counter += 1
     else:
@@ -195,16 +231,15 @@ def create_team(request, payload: TeamCreateIn):
         if Team.objects.filter(slug=slug).exists():
             return {"error": "Slug already exists"}, 400
 
-    # Create team
-    team = Team.objects.create(
-        name=payload.name,
-        slug=slug,
-        team_type='shared',
-        owner=user
-    )
-
-    # Add creator as owner member
-    TeamMember.objects.create(team=team, user=user, roles=['owner'])
+    # Create team and add creator as owner member in one transaction
+    with transaction.atomic():
+        team = Team.objects.create(
+            name=payload.name,
+            slug=slug,
+            team_type='shared',
+            owner=user
+        )
+        TeamMember.objects.create(team=team, user=user, roles=['owner'])
 
     return {
         "id": team.id,
@@ -212,7 +247,7 @@ def create_team(request, payload: TeamCreateIn):
         "slug": team.slug,
         "team_type": team.team_type,
         "owner_id": team.owner_id,
-        "owner_username": team.owner.username,
+        "owner_username": user.username,  # Creator is the owner
         "member_count": 1,
         "created_at": team.created_at,
         "updated_at": team.updated_at
@@ -222,12 +257,11 @@ def create_team(request, payload: TeamCreateIn):
 @router.patch("/teams/{slug}", response=TeamOut, auth=session_mfa_auth)
 def update_team(request, slug: str, payload: TeamUpdateIn):
     """Update team details (owner/admin only)"""
-    user = request.auth
-    team = get_object_or_404(Team, slug=slug)
+    team = get_object_or_404(Team.objects.select_related('owner'), slug=slug)
 
     # Check permissions
-    membership = TeamMember.objects.filter(team=team, user=user).first()
-    if not membership or not (membership.has_role('owner') or membership.has_role('admin')):
+    roles = get_user_roles(request, team.id)
+    if not roles or not ('owner' in roles or 'admin' in roles):
         return {"error": "Permission denied"}, 403
 
     # Update fields
@@ -273,12 +307,11 @@ def delete_team(request, slug: str):
 @router.post("/teams/{slug}/members", response=MessageOut, auth=session_mfa_auth)
 def add_team_member(request, slug: str, payload: TeamMemberAddIn):
     """Add a member to the team (owner/admin only)"""
-    user = request.auth
-    team = get_object_or_404(Team, slug=slug)
+    team = get_object_or_404(Team.objects.only('id', 'team_type'), slug=slug)
 
     # Check permissions
-    membership = TeamMember.objects.filter(team=team, user=user).first()
-    if not membership or not (membership.has_role('owner') or membership.has_role('admin')):
+    roles = get_user_roles(request, team.id)
+    if not roles or not ('owner' in roles or 'admin' in roles):
         return {"success": False, "message": "Permission denied"}
 
     # Get user to add by email
@@ -289,20 +322,20 @@ def add_team_member(request, slug: str, payload: TeamMemberAddIn):
         return {"success": False, "message": "User is already a member"}
 
     # Validate roles
-    valid_roles = ['owner', 'admin', 'editor', 'runner', 'viewer']
-    for role in payload.roles:
-        if role not in valid_roles:
-            return {"success": False, "message": f"Invalid role: {role}"}
+    role_set = set(payload.roles)
+    invalid = role_set - VALID_ROLES
+    if invalid:
+        return {"success": False, "message": f"Invalid role: {next(iter(invalid))}"}
 
     # Only owner can add other owners
-    if 'owner' in payload.roles and not membership.has_role('owner'):
+    if 'owner' in role_set and 'owner' not in roles:
         return {"success": False, "message": "Only owner can add other owners"}
 
     # Apply role inheritance: if owner or admin, set only that role
     final_roles = payload.roles
-    if 'owner' in payload.roles:
+    if 'owner' in role_set:
         final_roles = ['owner']
-    elif 'admin' in payload.roles:
+    elif 'admin' in role_set:
         final_roles = ['admin']
 
     # Add member
@@ -315,37 +348,37 @@ def add_team_member(request, slug: str, payload: TeamMemberAddIn):
 def update_team_member_role(request, slug: str, user_id: int, payload: TeamMemberUpdateIn):
     """Update a team member's roles (owner/admin only)"""
     user = request.auth
-    team = get_object_or_404(Team, slug=slug)
+    team = get_object_or_404(Team.objects.only('id', 'team_type'), slug=slug)
 
     # Check requester permissions
-    requester_membership = TeamMember.objects.filter(team=team, user=user).first()
-    if not requester_membership or not (requester_membership.has_role('owner') or requester_membership.has_role('admin')):
+    requester_roles = get_user_roles(request, team.id)
+    if not requester_roles or not ('owner' in requester_roles or 'admin' in requester_roles):
         return {"success": False, "message": "Permission denied"}
 
     # Get target member
     target_member = get_object_or_404(TeamMember, team=team, user_id=user_id)
 
     # Validate roles
-    valid_roles = ['owner', 'admin', 'editor', 'runner', 'viewer']
-    for role in payload.roles:
-        if role not in valid_roles:
-            return {"success": False, "message": f"Invalid role: {role}"}
+    role_set = set(payload.roles)
+    invalid = role_set - VALID_ROLES
+    if invalid:
+        return {"success": False, "message": f"Invalid role: {next(iter(invalid))}"}
 
     # Only owner can change roles to/from owner
-    if ('owner' in payload.roles or target_member.has_role('owner')) and not requester_membership.has_role('owner'):
+    if ('owner' in role_set or target_member.has_role('owner')) and 'owner' not in requester_roles:
         return {"success": False, "message": "Only owner can manage owner role"}
 
     # Cannot demote yourself if you're the only owner
     if user_id == user.id and target_member.has_role('owner'):
-        owner_count = sum(1 for m in TeamMember.objects.filter(team=team) if m.has_role('owner'))
-        if owner_count <= 1 and 'owner' not in payload.roles:
+        owner_count = TeamMember.objects.filter(team=team, roles__contains=['owner']).count()
+        if owner_count <= 1 and 'owner' not in role_set:
             return {"success": False, "message": "Cannot demote the only owner"}
 
     # Apply role inheritance: if owner or admin, set only that role
     final_roles = payload.roles
-    if 'owner' in payload.roles:
+    if 'owner' in role_set:
         final_roles = ['owner']
-    elif 'admin' in payload.roles:
+    elif 'admin' in role_set:
         final_roles = ['admin']
 
     # Update roles
@@ -359,7 +392,7 @@ def update_team_member_role(request, slug: str, user_id: int, payload: TeamMembe
 def remove_team_member(request, slug: str, user_id: int):
     """Remove a member from the team (owner/admin only, or self-removal)"""
     user = request.auth
-    team = get_object_or_404(Team, slug=slug)
+    team = get_object_or_404(Team.objects.only('id', 'team_type'), slug=slug)
 
     # Personal teams cannot have members removed
     if team.team_type == 'personal':
@@ -372,19 +405,19 @@ def remove_team_member(request, slug: str, user_id: int):
     if user_id == user.id:
         # Cannot leave if you're the only owner
         if target_member.has_role('owner'):
-            owner_count = sum(1 for m in TeamMember.objects.filter(team=team) if m.has_role('owner'))
+            owner_count = TeamMember.objects.filter(team=team, roles__contains=['owner']).count()
             if owner_count <= 1:
                 return {"success": False, "message": "Cannot leave as the only owner"}
         target_member.delete()
         return {"success": True, "message": "Left team successfully"}
 
     # Check permissions for removing others
-    requester_membership = TeamMember.objects.filter(team=team, user=user).first()
-    if not requester_membership or not (requester_membership.has_role('owner') or requester_membership.has_role('admin')):
+    requester_roles = get_user_roles(request, team.id)
+    if not requester_roles or not ('owner' in requester_roles or 'admin' in requester_roles):
         return {"success": False, "message": "Permission denied"}
 
     # Only owner can remove owner
-    if target_member.has_role('owner') and not requester_membership.has_role('owner'):
+    if target_member.has_role('owner') and 'owner' not in requester_roles:
         return {"success": False, "message": "Only owner can remove other owners"}
 
     target_member.delete()
@@ -395,56 +428,58 @@ def remove_team_member(request, slug: str, user_id: int):
 # Dashboard Stats
 # ======================
 
-@router.get("/teams/{slug}/stats", response=DashboardStatsOut, auth=session_mfa_auth)
-def get_team_stats(request, slug: str):
-    """Get dashboard statistics for a team"""
+def _team_basic_stats(team):
+    """Function/deployment and invocation counts for a team, one aggregate query per model"""
     from functions.models import Function, FunctionInvocation
     from django.utils import timezone
     from datetime import timedelta
 
-    user = request.auth
-    team = get_object_or_404(Team, slug=slug)
-
-    # Check if user is a member of this team
-    if not TeamMember.objects.filter(team=team, user=user).exists():
-        return {"total_functions": 0, "total_invocations": 0, "total_deployments": 0, "recent_invocations": 0}
-
-    # Get counts
-    total_functions = Function.objects.filter(team=team).count()
-    total_invocations = FunctionInvocation.objects.filter(function__team=team).count()
-
-    # Count deployments (functions with last_deployed_at set)
-    total_deployments = Function.objects.filter(team=team, last_deployed_at__isnull=False).count()
+    function_counts = Function.objects.filter(team=team).aggregate(
+        total=Count('id'),
+        # Deployments are functions with last_deployed_at set
+        deployed=Count('id', filter=Q(last_deployed_at__isnull=False))
+    )
 
     # Recent invocations (last 24 hours)
     twenty_four_hours_ago = timezone.now() - timedelta(hours=24)
-    recent_invocations = FunctionInvocation.objects.filter(
-        function__team=team,
-        created_at__gte=twenty_four_hours_ago
-    ).count()
+    invocation_counts = FunctionInvocation.objects.filter(function__team=team).aggregate(
+        total=Count('id'),
+        recent=Count('id', filter=Q(created_at__gte=twenty_four_hours_ago))
+    )
 
     return {
-        "total_functions": total_functions,
-        "total_invocations": total_invocations,
-        "total_deployments": total_deployments,
-        "recent_invocations": recent_invocations
+        "total_functions": function_counts['total'],
+        "total_invocations": invocation_counts['total'],
+        "total_deployments": function_counts['deployed'],
+        "recent_invocations": invocation_counts['recent']
     }
 
 
+@router.get("/teams/{slug}/stats", response=DashboardStatsOut, auth=session_mfa_auth)
+def get_team_stats(request, slug: str):
+    """Get dashboard statistics for a team"""
+    team = get_object_or_404(Team.objects.only('id'), slug=slug)
+
+    # Check if user is a member of this team
+    if get_user_roles(request, team.id) is None:
+        return {"total_functions": 0, "total_invocations": 0, "total_deployments": 0, "recent_invocations": 0}
+
+    return _team_basic_stats(team)
+
+
 @router.get("/teams/{slug}/enhanced-stats", response=EnhancedDashboardStatsOut, auth=session_mfa_auth)
 def get_enhanced_team_stats(request, slug: str):
     """Get enhanced dashboard statistics with charts data"""
     from functions.models import Function, FunctionInvocation
     from django.utils import timezone
-    from django.db.models import Count, Q
+    from django.db.models import Case, CharField, Value, When
+    from django.db.models.functions import TruncHour
     from datetime import timedelta
-    from collections import defaultdict
 
-    user = request.auth
     team = get_object_or_404(Team, slug=slug)
 
     # Check if user is a member of this team
-    if not TeamMember.objects.filter(team=team, user=user).exists():
+    if get_user_roles(request, team.id) is None:
         # Return empty data
         return {
             "stats": {
@@ -460,36 +495,32 @@ def get_enhanced_team_stats(request, slug: str):
         }
 
     # Basic stats
-    total_functions = Function.objects.filter(team=team).count()
-    total_invocations = FunctionInvocation.objects.filter(function__team=team).count()
-    total_deployments = Function.objects.filter(team=team, last_deployed_at__isnull=False).count()
+    stats = _team_basic_stats(team)
 
-    twenty_four_hours_ago = timezone.now() - timedelta(hours=24)
-    recent_invocations = FunctionInvocation.objects.filter(
-        function__team=team,
-        created_at__gte=twenty_four_hours_ago
-    ).count()
-
-    # Invocation trend (last 24 hours, grouped by hour)
-    invocation_trend = []
-    now = timezone.now()
-    for i in range(24):
-        hour_start = now - timedelta(hours=24-i)
-        hour_end = hour_start + timedelta(hours=1)
+    # Invocation trend (last 24 clock hours, grouped by hour in a single query)
+    current_hour = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+    hours = [current_hour - timedelta(hours=23 - i) for i in range(24)]
 
-        hour_invocations = FunctionInvocation.objects.filter(
+    hourly_counts = {
+        row['hour']: row
+        for row in FunctionInvocation.objects.filter(
             function__team=team,
-            created_at__gte=hour_start,
-            created_at__lt=hour_end
-        )
-
-        total = hour_invocations.count()
-        errors = hour_invocations.filter(status='error').count()
+            created_at__gte=hours[0]
+        ).annotate(
+            hour=TruncHour('created_at')
+        ).values('hour').annotate(
+            total=Count('id'),
+            errors=Count('id', filter=Q(status='error'))
+        ).order_by()
+    }
 
+    invocation_trend = []
+    for i, hour_start in enumerate(hours):
+        row = hourly_counts.get(hour_start)
         invocation_trend.append({
             "hour": f"{i}:00",
-            "invocations": total,
-            "errors": errors
+            "invocations": row['total'] if row else 0,
+            "errors": row['errors'] if row else 0
         })
 
     # Top functions (last 7 days)
@@ -501,7 +532,7 @@ def get_enhanced_team_stats(request, slug: str):
             'invocations',
             filter=Q(invocations__created_at__gte=seven_days_ago)
         )
-    ).filter(recent_invocations__gt=0).order_by('-recent_invocations')[:5]
+    ).filter(recent_invocations__gt=0).order_by('-recent_invocations').only('name', 'runtime')[:5]
 
     top_functions = [
         {
@@ -512,19 +543,18 @@ def get_enhanced_team_stats(request, slug: str):
         for func in top_functions_data
     ]
 
-    # Runtime distribution
-    runtime_counts = defaultdict(int)
-    for func in Function.objects.filter(team=team):
-        # Extract base runtime (e.g., "python3.12" -> "Python")
-        runtime = func.runtime.lower()
-        if 'python' in runtime:
-            runtime_counts['Python'] += 1
-        elif 'node' in runtime or 'nodejs' in runtime:
-            runtime_counts['Node.js'] += 1
-        elif 'ruby' in runtime:
-            runtime_counts['Ruby'] += 1
-        else:
-            runtime_counts['Other'] += 1
+    # Runtime distribution, bucketed by base runtime (e.g., "python3.12" -> "Python") in SQL
+    runtime_counts = dict(
+        Function.objects.filter(team=team).annotate(
+            family=Case(
+                When(runtime__icontains='python', then=Value('Python')),
+                When(runtime__icontains='node', then=Value('Node.js')),
+                When(runtime__icontains='ruby', then=Value('Ruby')),
+                default=Value('Other'),
+                output_field=CharField()
+            )
+        ).values('family').annotate(count=Count('id')).order_by().values_list('family', 'count')
+    )
 
     runtime_colors = {
         'Python': '#3b82f6',
@@ -546,7 +576,10 @@ def get_enhanced_team_stats(request, slug: str):
     # Recent activity (last 10 invocations)
     recent_invocations_qs = FunctionInvocation.objects.filter(
         function__team=team
-    ).select_related('function').order_by('-created_at')[:10]
+    ).select_related('function').only(
+        # The FK must stay loaded for select_related; function__name avoids a lazy load per row
+        'status', 'created_at', 'duration_ms', 'function', 'function__name'
+    ).order_by('-created_at')[:10]
 
     recent_activity = [
         {
@@ -559,12 +592,7 @@ def get_enhanced_team_stats(request, slug: str):
     ]
 
     return {
-        "stats": {
-            "total_functions": total_functions,
-            "total_invocations": total_invocations,
-            "total_deployments": total_deployments,
-            "recent_invocations": recent_invocations
-        },
+        "stats": stats,
         "invocation_trend": invocation_trend,
         "top_functions": top_functions,
         "runtime_distribution": runtime_distribution,
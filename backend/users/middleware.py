@@ -2,6 +2,10 @@ from django.shortcuts import redirect
 from django.urls import resolve, reverse
 from .models import SiteSettings
 
+# allauth is mounted under /accounts/ (see backend/urls.py); only paths under
+# this prefix can resolve to the signup view
+SIGNUP_PREFIX = '/accounts/signup'
+
 
 class RegistrationControlMiddleware:
     """
@@ -13,6 +17,10 @@ class RegistrationControlMiddleware:
         self.get_response = get_response
 
     def __call__(self, request):
+        # Cheap prefix check so resolve() only runs for plausible signup paths
+        if not request.path_info.startswith(SIGNUP_PREFIX):
+            return self.get_response(request)
+
         # Check if this is a signup request
         try:
             resolved = resolve(request.path_info)
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.11 on 2026-10-15 23:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OIDCProvider',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider_type', models.CharField(choices=[('authelia', 'Authelia'), ('keycloak', 'Keycloak'), ('authentik', 'Authentik')], help_text='Type of OIDC provider (only one per type allowed)', max_length=20, unique=True)),
+                ('provider_name', models.CharField(help_text='Custom display name for this provider', max_length=255)),
+                ('client_id', models.CharField(max_length=255)),
+                ('client_secret', models.CharField(help_text='OIDC client secret (should be encrypted in production)', max_length=500)),
+                ('server_url', models.URLField(help_text='OIDC well-known configuration endpoint URL', max_length=500)),
+                ('enabled', models.BooleanField(default=True, help_text='Whether this provider is active')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['enabled'], name='users_oidcp_enabled_29ac40_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SiteSettings',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('allow_registration', models.BooleanField(default=True, help_text='Allow new users to register. When disabled, signup page redirects to login.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='site_settings_updates', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Site Settings',
+                'verbose_name_plural': 'Site Settings',
+            },
+        ),
+        migrations.CreateModel(
+            name='Team',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('slug', models.SlugField(max_length=255, unique=True)),
+                ('team_type', models.CharField(choices=[('personal', 'Personal'), ('shared', 'Shared')], default='shared', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owned_teams', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TeamMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('roles', models.JSONField(default=list)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='users.team')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-joined_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='members',
+            field=models.ManyToManyField(related_name='teams', through='users.TeamMember', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_admin', models.BooleanField(default=False)),
+                ('user', models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='teammember',
+            index=models.Index(fields=['team', 'user'], name='users_teamm_team_id_3c71c4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='teammember',
+            unique_together={('team', 'user')},
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['slug'], name='users_team_slug_7df463_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['owner'], name='users_team_owner_i_eb6c00_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.11 on 2026-10-15 23:02
+
+from django.db import migrations, models
+
+
+def backfill_effective_roles(apps, schema_editor):
+    """Fill effective_roles for existing memberships (same inheritance as TeamMember.expand_roles)"""
+    TeamMember = apps.get_model('users', 'TeamMember')
+
+    members = list(TeamMember.objects.exclude(roles=[]).only('id', 'roles'))
+    for member in members:
+        effective = set(member.roles)
+        if 'owner' in effective:
+            effective.update(['admin', 'editor', 'runner', 'viewer'])
+        elif 'admin' in effective:
+            effective.update(['editor', 'runner', 'viewer'])
+        member.effective_roles = sorted(effective)
+    TeamMember.objects.bulk_update(members, ['effective_roles'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_teammember_user_team_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teammember',
+            name='effective_roles',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunPython(backfill_effective_roles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.11 on 2026-10-15 23:02
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations, models
+
+
+# PostgreSQL won't cast jsonb to an array, and ALTER COLUMN ... USING doesn't allow
+# the subquery (jsonb_array_elements_text) that would unpack it. Role strings are
+# plain identifiers, so rewriting the JSON text '["a", "b"]' as the array literal
+# '{"a", "b"}' is exact.
+FORWARD_SQL = (
+    "ALTER TABLE users_teammember ALTER COLUMN roles TYPE varchar(16)[] "
+    "USING translate(roles::text, '[]', '{}')::varchar(16)[]"
+)
+REVERSE_SQL = "ALTER TABLE users_teammember ALTER COLUMN roles TYPE jsonb USING to_jsonb(roles)"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_teammember_effective_roles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=FORWARD_SQL,
+            reverse_sql=REVERSE_SQL,
+            state_operations=[
+                migrations.AlterField(
+                    model_name='teammember',
+                    name='roles',
+                    field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=16), default=list, size=None),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='teammember',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['roles'], name='tm_roles_gin'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.11 on 2026-10-15 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_teammember_roles_array'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='oidcprovider',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='team',
+            options={},
+        ),
+        migrations.RemoveIndex(
+            model_name='oidcprovider',
+            name='users_oidcp_enabled_29ac40_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='team',
+            name='users_team_slug_7df463_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='team',
+            name='users_team_owner_i_eb6c00_idx',
+        ),
+        migrations.AddIndex(
+            model_name='oidcprovider',
+            index=models.Index(condition=models.Q(('enabled', True)), fields=['enabled'], name='oidc_enabled_idx'),
+        ),
+    ]
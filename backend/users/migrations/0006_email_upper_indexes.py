@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+# OIDC account linking (users.adapters) filters User and EmailAddress with
+# email__iexact, which PostgreSQL evaluates as UPPER(email::text) = UPPER(%s).
+# auth_user and account_emailaddress aren't our models, so the matching
+# expression indexes are created here instead of in Meta.indexes.
+EMAIL_TABLES = ('auth_user', 'account_emailaddress')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_team_oidcprovider_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('account', '0002_email_max_length'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=f'CREATE INDEX IF NOT EXISTS "{table}_email_upper_idx" ON "{table}" (UPPER("email"::text))',
+            reverse_sql=f'DROP INDEX IF EXISTS "{table}_email_upper_idx"',
+        )
+        for table in EMAIL_TABLES
+    ]
@@ -0,0 +1,29 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# search_users ORs icontains over these auth_user columns, which PostgreSQL
+# evaluates as UPPER(col::text) LIKE UPPER('%q%'). One GIN trigram index per
+# matching expression lets the planner bitmap-OR them instead of seq-scanning.
+USER_SEARCH_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_email_upper_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+    ] + [
+        migrations.RunSQL(
+            sql=(
+                f'CREATE INDEX IF NOT EXISTS "auth_user_{field}_upper_trgm_idx" '
+                f'ON "auth_user" USING gin (UPPER("{field}"::text) gin_trgm_ops)'
+            ),
+            reverse_sql=f'DROP INDEX IF EXISTS "auth_user_{field}_upper_trgm_idx"',
+        )
+        for field in USER_SEARCH_FIELDS
+    ]
@@ -1,5 +1,14 @@
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.core.cache import cache
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+import copy
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True)
@@ -20,7 +29,7 @@ class Team(models.Model):
     ]
 
     name = models.CharField(max_length=255)
-    slug = models.SlugField(max_length=255, unique=True, db_index=True)
+    slug = models.SlugField(max_length=255, unique=True)  # Indexed by the unique constraint
     team_type = models.CharField(
         max_length=20,
         choices=TEAM_TYPE_CHOICES,
@@ -39,17 +48,26 @@ class Team(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    class Meta:
-        ordering = ['-created_at']
-        indexes = [
-            models.Index(fields=['slug']),
-            models.Index(fields=['owner']),
-        ]
-
     def __str__(self):
         return f"{self.name} ({self.get_team_type_display()})"
 
 
+# Role bitmask: one bit per role, so inheritance and permission checks are integer ops
+ROLE_OWNER = 1
+ROLE_ADMIN = 2
+ROLE_EDITOR = 4
+ROLE_RUNNER = 8
+ROLE_VIEWER = 16
+ROLE_ALL = ROLE_OWNER | ROLE_ADMIN | ROLE_EDITOR | ROLE_RUNNER | ROLE_VIEWER
+ROLE_BITS = {
+    'owner': ROLE_OWNER,
+    'admin': ROLE_ADMIN,
+    'editor': ROLE_EDITOR,
+    'runner': ROLE_RUNNER,
+    'viewer': ROLE_VIEWER,
+}
+
+
 class TeamMember(models.Model):
     """
     Explicit through model for Team-User many-to-many relationship.
@@ -73,34 +91,74 @@ class TeamMember(models.Model):
     ]
 
     team = models.ForeignKey(Team, on_delete=models.CASCADE)
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    roles = models.JSONField(default=list)  # Array of role strings
+    # Indexed by the leading column of the (user, team) index below
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    # Array of role strings (jsonb before migration 0004)
+    roles = ArrayField(models.CharField(max_length=16), default=list)
+    # Denormalized roles + inherited roles, kept in sync by save() (sorted role strings)
+    effective_roles = models.JSONField(default=list, editable=False)
     joined_at = models.DateTimeField(auto_now_add=True)
 
-    def get_effective_roles(self):
+    @staticmethod
+    def expand_roles(roles):
         """
-        Returns all effective roles including inherited ones.
+        Returns the set of effective roles for a list of assigned roles.
         Owner inherits everything.
         Admin inherits viewer, runner, and editor.
         """
-        effective = set(self.roles)
+        effective = set(roles)
 
-        if 'owner' in self.roles:
+        if 'owner' in roles:
             effective.update(['admin', 'editor', 'runner', 'viewer'])
-        elif 'admin' in self.roles:
+        elif 'admin' in roles:
             effective.update(['editor', 'runner', 'viewer'])
 
-        return list(effective)
+        return effective
+
+    @staticmethod
+    def role_mask_for(roles):
+        """Returns the effective-role bitmask (ROLE_* bits, inheritance applied) for a list of roles."""
+        mask = 0
+        for role in roles:
+            mask |= ROLE_BITS.get(role, 0)
+
+        if mask & ROLE_OWNER:
+            mask = ROLE_ALL
+        elif mask & ROLE_ADMIN:
+            mask |= ROLE_EDITOR | ROLE_RUNNER | ROLE_VIEWER
+
+        return mask
+
+    def get_effective_roles(self):
+        """Returns all effective roles including inherited ones."""
+        return list(self.effective_roles)
+
+    @cached_property
+    def role_mask(self):
+        """Effective-role bitmask, computed once per instance from the stored effective_roles."""
+        return self.role_mask_for(self.effective_roles)
 
     def has_role(self, role):
         """Check if user has a specific role (including inherited)."""
-        return role in self.get_effective_roles()
+        return bool(self.role_mask & ROLE_BITS.get(role, 0))
+
+    def save(self, *args, **kwargs):
+        # Keep the denormalized effective roles in sync with the assigned roles
+        self.effective_roles = sorted(self.expand_roles(self.roles))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'roles' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'effective_roles'}
+        super().save(*args, **kwargs)
 
     class Meta:
         unique_together = ('team', 'user')
         ordering = ['-joined_at']
         indexes = [
             models.Index(fields=['team', 'user']),
+            # Per-user lookups (a user's teams, permission checks filtered by user first)
+            models.Index(fields=['user', 'team'], name='tm_user_team_idx'),
+            # Role containment filters (roles__contains=['owner'])
+            GinIndex(fields=['roles'], name='tm_roles_gin'),
         ]
 
     def __str__(self):
@@ -145,9 +203,9 @@ class OIDCProvider(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['enabled']),
+            # Partial: only the enabled providers are ever looked up
+            models.Index(fields=['enabled'], condition=models.Q(enabled=True), name='oidc_enabled_idx'),
         ]
 
     def __str__(self):
@@ -159,6 +217,10 @@ class OIDCProvider(models.Model):
         return f"{self.provider_type}_{self.id}"
 
 
+# In-process SiteSettings cache: {'settings': (version, expires_at, instance)}
+_site_settings_cache = {}
+
+
 class SiteSettings(models.Model):
     """
     Site-wide settings that control platform behavior.
@@ -184,8 +246,43 @@ class SiteSettings(models.Model):
     def __str__(self):
         return "Site Settings"
 
+    # The instance is held in process memory, tagged with a version kept in the shared
+    # (Redis) cache; bumping the version on save invalidates it in every process. The
+    # timeout bounds staleness if the version key is lost (e.g. a Redis restart).
+    CACHE_VERSION_KEY = 'site_settings_version'
+    CACHE_TIMEOUT = 60
+
     @classmethod
     def get_settings(cls):
-        """Get or create the singleton settings instance"""
-        settings, _ = cls.objects.get_or_create(pk=1)
-        return settings
\ No newline at end of file
+        """Get or create the singleton settings instance (cached; callers get their own copy)"""
+        try:
+            version = cache.get_or_set(cls.CACHE_VERSION_KEY, 1, None)
+        except Exception:
+            # Without the shared version a cached instance could be stale, so read through
+            version = None
+
+        cached = _site_settings_cache.get('settings')
+        if version is not None and cached is not None and cached[0] == version and cached[1] > time.monotonic():
+            return copy.copy(cached[2])
+
+        # Plain lookup first; only the very first access has to go through the insert path
+        try:
+            settings = cls.objects.get(pk=1)
+        except cls.DoesNotExist:
+            settings, _ = cls.objects.get_or_create(pk=1)
+        if version is not None:
+            _site_settings_cache['settings'] = (version, time.monotonic() + cls.CACHE_TIMEOUT, copy.copy(settings))
+        return settings
+
+    @classmethod
+    def invalidate_cache(cls):
+        """Force the next get_settings() call to reload from the database"""
+        _site_settings_cache.pop('settings', None)
+        try:
+            cache.incr(cls.CACHE_VERSION_KEY)
+        except ValueError:
+            # Version key was evicted; stale entries expire within CACHE_TIMEOUT
+            cache.set(cls.CACHE_VERSION_KEY, 1, None)
+        except Exception as e:
+            # Cache unreachable: other processes pick up the change within CACHE_TIMEOUT
+            logger.warning(f"Failed to bump the SiteSettings cache version: {e}")
\ No newline at end of file
@@ -1,16 +1,24 @@
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.text import slugify
-from .models import UserProfile, Team, TeamMember
+from .models import UserProfile, Team, TeamMember, SiteSettings
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        # Make the first user a superuser and staff
-        if User.objects.count() == 1:
-            instance.is_superuser = True
-            instance.is_staff = True
-            instance.save(update_fields=['is_superuser', 'is_staff'])
+        with transaction.atomic():
+            # Make the first user a superuser and staff (exists() stops at the first other row)
+            if not User.objects.exclude(pk=instance.pk).exists():
+                instance.is_superuser = True
+                instance.is_staff = True
+                instance.save(update_fields=['is_superuser', 'is_staff'])
 
-        profile = UserProfile.objects.create(user=instance)
+            UserProfile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=SiteSettings)
+def invalidate_site_settings_cache(sender, instance, **kwargs):
+    """Drop the cached SiteSettings after any save (API or admin)"""
+    SiteSettings.invalidate_cache()
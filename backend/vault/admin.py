@@ -39,6 +39,7 @@ class SecretAdmin(admin.ModelAdmin):
     search_fields = ('key', 'description', 'team__name')
     readonly_fields = ('created_at', 'updated_at')
     autocomplete_fields = ['team', 'created_by']
+    ordering = ('key',)
 
     fieldsets = (
         (None, {
@@ -2,15 +2,19 @@ from ninja import Router
 from ninja.errors import HttpError
 from typing import List
 from uuid import UUID
+from django.db.models import OuterRef, Subquery
 from django.shortcuts import get_object_or_404
 from pydantic import BaseModel, Field
 
 from users.auth import session_mfa_auth
-from users.models import Team, TeamMember
+from users.models import ROLE_ADMIN, ROLE_EDITOR, ROLE_OWNER, Team, TeamMember
 from .models import Secret
 
 router = Router(tags=["Vault"])
 
+# Any of these roles may create, update or delete a team's secrets
+SECRET_WRITE_MASK = ROLE_EDITOR | ROLE_ADMIN | ROLE_OWNER
+
 
 class SecretCreateIn(BaseModel):
     """Schema for creating a new secret."""
@@ -36,17 +40,35 @@ class SecretOut(BaseModel):
     updated_at: str
     created_by_username: str | None
 
-    @staticmethod
-    def from_orm(secret: Secret):
-        return SecretOut(
-            id=secret.id,
-            uuid=secret.uuid,
-            key=secret.key,
-            description=secret.description,
-            created_at=secret.created_at.isoformat(),
-            updated_at=secret.updated_at.isoformat(),
-            created_by_username=secret.created_by.email if secret.created_by else None,
-        )
+
+def _secret_out(secret: Secret) -> SecretOut:
+    """Build SecretOut from a saved Secret without re-validating DB-sourced values."""
+    return SecretOut.model_construct(
+        id=secret.id,
+        uuid=secret.uuid,
+        key=secret.key,
+        description=secret.description,
+        created_at=secret.created_at.isoformat(),
+        updated_at=secret.updated_at.isoformat(),
+        created_by_username=secret.created_by.email if secret.created_by else None,
+    )
+
+
+SECRET_COLUMNS = tuple(field.name for field in Secret._meta.concrete_fields)
+SECRET_LIST_FIELDS = ('id', 'uuid', 'key', 'description', 'created_at', 'updated_at', 'created_by__email')
+
+
+def _secret_to_dict(row):
+    """Serialize a Secret .values() row to the SecretOut shape without building a model."""
+    return {
+        "id": row['id'],
+        "uuid": str(row['uuid']),
+        "key": row['key'],
+        "description": row['description'],
+        "created_at": row['created_at'].isoformat(),
+        "updated_at": row['updated_at'].isoformat(),
+        "created_by_username": row['created_by__email'],
+    }
 
 
 @router.get("/", response=List[SecretOut])
@@ -58,19 +80,16 @@ def list_secrets(request, team_id: int = None):
     if not request.user.is_authenticated:
         return []
 
-    # Get user's team memberships
-    user_teams = TeamMember.objects.filter(user=request.user).values_list('team_id', flat=True)
+    # Restrict to the user's teams with a join, so membership is checked in the same query
+    # (TeamMember is unique per team/user, so no duplicate rows)
+    secrets = Secret.objects.filter(team__teammember__user=request.user).order_by('key')
 
     # If team_id is provided, filter by specific team
     if team_id is not None:
-        # Verify user has access to this team
-        if team_id not in user_teams:
-            return []
-        secrets = Secret.objects.filter(team_id=team_id).select_related('created_by', 'team')
-    else:
-        secrets = Secret.objects.filter(team_id__in=user_teams).select_related('created_by', 'team')
+        secrets = secrets.filter(team_id=team_id)
 
-    return [SecretOut.from_orm(secret) for secret in secrets]
+    # Plain dicts from .values(), so no model instances are built; ninja validates them against SecretOut
+    return [_secret_to_dict(row) for row in secrets.values(*SECRET_LIST_FIELDS)]
 
 
 @router.post("/", response=SecretOut, auth=session_mfa_auth)
@@ -80,14 +99,14 @@ def create_secret(request, payload: SecretCreateIn, team_id: int):
     User must be a member of the team with editor, admin, or owner role.
     """
     # Check team access
-    team = get_object_or_404(Team, id=team_id)
-    membership = TeamMember.objects.filter(user=request.user, team=team).first()
+    team = get_object_or_404(Team.objects.only('id'), id=team_id)
+    membership = TeamMember.objects.filter(user=request.user, team=team).only('effective_roles').first()
 
     if not membership:
         raise HttpError(403, "You don't have access to this team")
 
     # Check if user has required role
-    if not membership.has_role('editor') and not membership.has_role('admin') and not membership.has_role('owner'):
+    if not membership.role_mask & SECRET_WRITE_MASK:
         raise HttpError(403, "You need editor, admin, or owner role to create secrets")
 
     # Check if secret with this key already exists
@@ -103,7 +122,29 @@ def create_secret(request, payload: SecretCreateIn, team_id: int):
     secret.set_value(payload.value)
     secret.save()
 
-    return SecretOut.from_orm(secret)
+    return _secret_out(secret)
+
+
+def _get_secret_with_roles(request, secret_id):
+    """
+    Fetch a secret by UUID with the requesting user's roles in its team annotated
+    as user_roles (effective roles, None if not a member), in a single query.
+    """
+    try:
+        secret_uuid = UUID(secret_id)
+    except ValueError:
+        raise HttpError(400, "Invalid secret ID")
+
+    user_roles = TeamMember.objects.filter(
+        team=OuterRef('team'), user=request.user
+    ).values('effective_roles')[:1]
+    return get_object_or_404(
+        Secret.objects.select_related('created_by')
+        # Every Secret column (saves stay full-row) but only the creator's email
+        .only(*SECRET_COLUMNS, 'created_by__email')
+        .annotate(user_roles=Subquery(user_roles)),
+        uuid=secret_uuid
+    )
 
 
 @router.put("/{secret_id}", response=SecretOut, auth=session_mfa_auth)
@@ -112,16 +153,14 @@ def update_secret(request, secret_id: str, payload: SecretUpdateIn):
     Update a secret by UUID.
     User must be a member of the secret's team with editor, admin, or owner role.
     """
-    secret = get_object_or_404(Secret, uuid=secret_id)
+    secret = _get_secret_with_roles(request, secret_id)
 
     # Check team access
-    membership = TeamMember.objects.filter(user=request.user, team=secret.team).first()
-
-    if not membership:
+    if secret.user_roles is None:
         raise HttpError(403, "You don't have access to this team")
 
     # Check if user has required role
-    if not membership.has_role('editor') and not membership.has_role('admin') and not membership.has_role('owner'):
+    if not TeamMember.role_mask_for(secret.user_roles) & SECRET_WRITE_MASK:
         raise HttpError(403, "You need editor, admin, or owner role to update secrets")
 
     # Update fields if provided
@@ -134,7 +173,7 @@ def update_secret(request, secret_id: str, payload: SecretUpdateIn):
 
     secret.save()
 
-    return SecretOut.from_orm(secret)
+    return _secret_out(secret)
 
 
 @router.delete("/{secret_id}", auth=session_mfa_auth)
@@ -143,16 +182,14 @@ def delete_secret(request, secret_id: str):
     Delete a secret by UUID.
     User must be a member of the secret's team with editor, admin, or owner role.
     """
-    secret = get_object_or_404(Secret, uuid=secret_id)
+    secret = _get_secret_with_roles(request, secret_id)
 
     # Check team access
-    membership = TeamMember.objects.filter(user=request.user, team=secret.team).first()
-
-    if not membership:
+    if secret.user_roles is None:
         raise HttpError(403, "You don't have access to this team")
 
     # Check if user has required role
-    if not membership.has_role('editor') and not membership.has_role('admin') and not membership.has_role('owner'):
+    if not TeamMember.role_mask_for(secret.user_roles) & SECRET_WRITE_MASK:
         raise HttpError(403, "You need editor, admin, or owner role to delete secrets")
 
     secret.delete()
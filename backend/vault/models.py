@@ -1,11 +1,20 @@
 from django.db import models
 from django.conf import settings
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
+from functools import lru_cache
 import base64
 import hashlib
+import logging
 import uuid
 
+logger = logging.getLogger(__name__)
 
+
+# Spaces and hyphens in secret keys become underscores (see Secret.save)
+_KEY_TRANSLATION = str.maketrans(' -', '__')
+
+
+@lru_cache(maxsize=1)
 def get_encryption_key():
     """Get or generate encryption key from settings."""
     secret_key = settings.SECRET_KEY.encode()
@@ -14,6 +23,12 @@ def get_encryption_key():
     return key
 
 
+@lru_cache(maxsize=1)
+def get_cipher():
+    """Process-wide Fernet for secret values (built lazily, once settings are loaded)."""
+    return Fernet(get_encryption_key())
+
+
 class Secret(models.Model):
     """
     Stores encrypted secrets at the team level.
@@ -22,8 +37,7 @@ class Secret(models.Model):
     uuid = models.UUIDField(
         default=uuid.uuid4,
         editable=False,
-        unique=True,
-        db_index=True,
+        unique=True,  # Already indexed by the unique constraint
         help_text="Unique identifier for the secret"
     )
     team = models.ForeignKey(
@@ -52,10 +66,16 @@ class Secret(models.Model):
     )
 
     class Meta:
-        ordering = ['key']
         unique_together = ('team', 'key')
         indexes = [
-            models.Index(fields=['team', 'key']),
+            # Matches list_secrets (team filter, ordered by key). The INCLUDE columns need
+            # PostgreSQL >= 11 and are ignored elsewhere; description is left out since long
+            # text in an index tuple can exceed the btree row size limit.
+            models.Index(
+                fields=['team', 'key'],
+                include=['uuid', 'created_at', 'updated_at', 'created_by'],
+                name='secret_team_key_cover',
+            ),
         ]
 
     def __str__(self):
@@ -63,17 +83,33 @@ class Secret(models.Model):
 
     def set_value(self, plain_value: str):
         """Encrypt and store a secret value."""
-        cipher = Fernet(get_encryption_key())
-        encrypted = cipher.encrypt(plain_value.encode())
+        encrypted = get_cipher().encrypt(plain_value.encode())
         self.encrypted_value = encrypted.decode()
 
     def get_value(self) -> str:
         """Decrypt and return the secret value."""
-        cipher = Fernet(get_encryption_key())
-        decrypted = cipher.decrypt(self.encrypted_value.encode())
+        decrypted = get_cipher().decrypt(self.encrypted_value.encode())
         return decrypted.decode()
 
+    @classmethod
+    def bulk_get_values(cls, queryset) -> dict[str, str]:
+        """
+        Decrypt every secret in queryset and return {key: value}.
+        Reads only the needed columns and shares one cipher; undecryptable secrets are skipped.
+        """
+        cipher = get_cipher()
+        values = {}
+        for secret_id, key, encrypted_value in queryset.values_list('id', 'key', 'encrypted_value'):
+            try:
+                values[key] = cipher.decrypt(encrypted_value.encode()).decode()
+            except (InvalidToken, UnicodeDecodeError):
+                logger.warning(f"Failed to decrypt secret {secret_id} ({key})")
+        return values
+
     def save(self, *args, **kwargs):
         # Ensure key is uppercase and follows env var naming conventions
-        self.key = self.key.upper().replace(' ', '_').replace('-', '_')
+        # (skipped for partial saves that don't write the key)
+        update_fields = kwargs.get('update_fields')
+        if self.pk is None or update_fields is None or 'key' in update_fields:
+            self.key = self.key.upper().translate(_KEY_TRANSLATION)
         super().save(*args, **kwargs)
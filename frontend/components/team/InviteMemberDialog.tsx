@@ -160,7 +160,7 @@ export const InviteMemberDialog = ({
                 />
 
                 {/* Dropdown with search results */}
-                {showDropdown && searchQuery.length >= 2 && (
+                {showDropdown && searchQuery.length >= 3 && (
                   <div className="absolute z-50 w-full mt-1 bg-popover border rounded-md shadow-md max-h-[300px] overflow-y-auto">
                     {isSearching ? (
                       <div className="py-6 text-center text-sm text-muted-foreground">
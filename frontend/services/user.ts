@@ -73,7 +73,7 @@ export interface UserSearchResult {
 }
 
 export async function searchUsers(query: string): Promise<UserSearchResult[]> {
-  if (!query || query.length < 2) {
+  if (!query || query.length < 3) {
     return [];
   }
 
@@ -418,6 +418,7 @@ DEFAULT_FROM_EMAIL=${DEFAULT_FROM_EMAIL}
 # === Kubernetes Configuration ===
 KUBERNETES_ENABLED=${KUBERNETES_ENABLED}
 KUBERNETES_NAMESPACE=${KUBERNETES_NAMESPACE}
+KUBERNETES_FUNCTION_NODE_SELECTOR=
 FUNCTION_BACKEND=${FUNCTION_BACKEND}
 
 # === OIDC/SSO Configuration ===